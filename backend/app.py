@@ -3,157 +3,378 @@ Flask application factory for HTE App.
 Creates and configures the Flask application with proper error handling and logging.
 """
 import os
+import json
 import logging
-from logging.handlers import RotatingFileHandler
-from flask import Flask, jsonify, request
-from flask_cors import CORS
+import multiprocessing
+import threading
+import time
+from collections import OrderedDict
+from enum import IntFlag
+from functools import lru_cache
+from importlib import import_module
+from logging.handlers import MemoryHandler, RotatingFileHandler
+from flask import Flask, Response, current_app, request
+from werkzeug.exceptions import HTTPException
 
 from config import get_config
 
-def create_app(config_name=None):
-    """Create and configure Flask application."""
-    app = Flask(__name__)
+# Route modules and the blueprint each one exports, imported on first request
+BLUEPRINTS = (
+    ('routes.inventory', 'inventory_bp'),
+    ('routes.experiment', 'experiment_bp'),
+    ('routes.solvent', 'solvent_bp'),
+    ('routes.molecules', 'molecules_bp'),
+    ('routes.kit', 'kit_bp'),
+    ('routes.uploads', 'uploads_bp'),
+    ('routes.export', 'export_bp'),
+    ('routes.experiment_import', 'import_bp'),
+)
+
+_blueprint_lock = threading.Lock()
+
+# Static error payloads, serialized once instead of per error
+NOT_FOUND_BODY = json.dumps({
+    'error': 'Not Found',
+    'message': 'The requested resource was not found',
+    'status_code': 404
+}).encode()
+BAD_REQUEST_TEMPLATE = b'{"error": "Bad Request", "message": %s, "status_code": 400}'
+SERVICE_UNAVAILABLE_TEMPLATE = b'{"error": "Service Unavailable", "message": %s, "status_code": 503}'
+INTERNAL_ERROR_BODY = json.dumps({
+    'error': 'Internal Server Error',
+    'message': 'An unexpected error occurred',
+    'status_code': 500
+}).encode()
+
+class HTEFlask(Flask):
+    """Flask application that samples tracebacks of unhandled exceptions."""
+    
+    def log_exception(self, exc_info):
+        """Log an unhandled exception, with its traceback only if not seen recently."""
+        if should_log_traceback(exc_info[1]):
+            super().log_exception(exc_info)
+        else:
+            self.logger.error('Exception on %s [%s]: %s: %s (traceback suppressed)',
+                              request.path, request.method, exc_info[0].__name__, exc_info[1])
+
+class FastRotatingFileHandler(RotatingFileHandler):
+    """RotatingFileHandler that tracks the file size in-process.
+    
+    The stock handler stats, seeks and formats every record twice to decide
+    whether to roll over; here that check is a single integer compare.
+    """
+    
+    def __init__(self, filename, *args, **kwargs):
+        super().__init__(filename, *args, **kwargs)
+        self._bytes = os.path.getsize(self.baseFilename) if os.path.exists(self.baseFilename) else 0
+    
+    def shouldRollover(self, record):
+        return self.maxBytes > 0 and self._bytes >= self.maxBytes
+    
+    def doRollover(self):
+        super().doRollover()
+        self._bytes = 0
+    
+    def emit(self, record):
+        try:
+            if self.shouldRollover(record):
+                self.doRollover()
+            if self.stream is None:
+                self.stream = self._open()
+            msg = self.format(record) + self.terminator
+            self.stream.write(msg)
+            self.flush()
+            # Count encoded bytes; non-ASCII text (e.g. "μmol") is longer on disk
+            self._bytes += len(msg.encode(self.encoding or 'utf-8'))
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+
+class Phase(IntFlag):
+    """Optional initialization phases of create_app()."""
+    CORS = 1
+    LOGGING = 2
+    SECURITY = 4
+    ROUTES = 8
+    INVENTORY = 16
+    COMPRESSION = 32
+    ALL = CORS | LOGGING | SECURITY | ROUTES | INVENTORY | COMPRESSION
+
+@lru_cache(maxsize=8)
+def create_app(config_name=None, phases=Phase.ALL):
+    """Create and configure Flask application.
+    
+    Memoized per config so test fixtures and forked workers share one app;
+    use reset_app_state() between tests instead of building a new app.
+    Tests that only need the routes can pass phases=Phase.ROUTES.
+    """
+    app = HTEFlask(__name__)
     
     # Load configuration
     config_class = get_config() if config_name is None else config_name
     app.config.from_object(config_class)
     
-    # Initialize extensions
-    CORS(app, 
-         origins=app.config['CORS_ORIGINS'],
-         methods=app.config['CORS_METHODS'],
-         allow_headers=app.config['CORS_HEADERS'])
+    # Serialize JSON with orjson when available
+    from json_provider import ORJSON_AVAILABLE, OrjsonProvider
+    if ORJSON_AVAILABLE:
+        app.json = OrjsonProvider(app)
+    
+    # Treat '/api/x' and '/api/x/' alike instead of redirecting
+    app.url_map.strict_slashes = False
+    
+    # Initialize CORS at the WSGI layer
+    if phases & Phase.CORS:
+        from security.cors import CORSMiddleware
+        app.wsgi_app = CORSMiddleware(
+            app.wsgi_app,
+            origins=app.config['CORS_ORIGINS'],
+            methods=app.config['CORS_METHODS'],
+            headers=app.config['CORS_HEADERS']
+        )
     
     # Configure logging
-    configure_logging(app)
+    if phases & Phase.LOGGING:
+        configure_logging(app)
     
     # Apply security measures
-    apply_security_measures(app)
+    if phases & Phase.SECURITY:
+        apply_security_measures(app)
+    
+    # Gzip large JSON responses
+    if phases & Phase.COMPRESSION and app.config['COMPRESS_ENABLED']:
+        from compression import init_compression
+        init_compression(app)
     
     # Register error handlers
     register_error_handlers(app)
     
     # Register blueprints
-    register_blueprints(app)
-    
-    # Import state management
-    from state import load_inventory
+    if phases & Phase.ROUTES:
+        register_blueprints(app)
+        
+        # Reject malformed session ids before routes that catch every exception see them
+        app.before_request(check_session_header)
     
-    # Initialize inventory on startup
-    with app.app_context():
-        try:
-            load_inventory()
-            app.logger.info("Inventory loaded successfully")
-        except Exception as e:
-            app.logger.warning(f"Failed to load inventory: {e}")
+    # Load inventory in the background; inventory views wait for it
+    if phases & Phase.INVENTORY:
+        from state import load_inventory_in_background
+        load_inventory_in_background(app)
     
     return app
 
+def reset_app_state():
+    """Reset per-request state (experiment data, rate limit counters) between tests."""
+    from state import reset_all_experiments
+    from security.rate_limiting import api_attempts, upload_attempts
+    
+    reset_all_experiments()
+    api_attempts.clear()
+    upload_attempts.clear()
+
 def configure_logging(app):
     """Configure application logging."""
     if not app.debug and not app.testing:
-        # Create logs directory if it doesn't exist
-        if not os.path.exists('logs'):
-            os.mkdir('logs')
+        log_dir = app.config['LOG_DIR']
+        ensure_log_dir(log_dir)
         
         # File handler with rotation
-        file_handler = RotatingFileHandler('logs/hte_app.log', maxBytes=10240, backupCount=10)
+        file_handler = FastRotatingFileHandler(
+            os.path.join(log_dir, 'hte_app.log'),
+            maxBytes=app.config['LOG_MAX_BYTES'],
+            backupCount=app.config['LOG_BACKUP_COUNT'],
+            encoding='utf-8'
+        )
         file_handler.setFormatter(logging.Formatter(
             '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'
         ))
         file_handler.setLevel(logging.INFO)
-        app.logger.addHandler(file_handler)
+        
+        # Buffer records in memory; errors and a periodic timer flush to disk
+        buffered_handler = MemoryHandler(
+            capacity=app.config['LOG_BUFFER_CAPACITY'],
+            flushLevel=logging.ERROR,
+            target=file_handler,
+            flushOnClose=True
+        )
+        buffered_handler.setLevel(logging.INFO)
+        app.logger.addHandler(buffered_handler)
+        app.extensions['log_buffer'] = buffered_handler
+        start_log_flusher(buffered_handler, app.config['LOG_FLUSH_INTERVAL'])
         
         app.logger.setLevel(logging.INFO)
         app.logger.info('HTE App startup')
 
+@lru_cache(maxsize=None)
+def ensure_log_dir(log_dir):
+    """Create the log directory once per process."""
+    os.makedirs(log_dir, exist_ok=True)
+
+def start_log_flusher(handler, interval):
+    """Flush a buffering log handler every `interval` seconds from a daemon thread."""
+    def flush_periodically():
+        while True:
+            time.sleep(interval)
+            handler.flush()
+    
+    thread = threading.Thread(target=flush_periodically, name='log-flusher', daemon=True)
+    thread.start()
+    return thread
+
+def check_session_header():
+    """Answer a malformed X-Session-Id header with a 400."""
+    from state.experiment import check_session_header as check
+    check()
+
 def apply_security_measures(app):
     """Apply security measures to the application."""
-    from security.headers import add_security_headers
-    from security.rate_limiting import apply_rate_limits
+    from security.headers import SecurityHeadersMiddleware, build_security_headers
+    from security.rate_limiting import apply_rate_limits, release_concurrency_slot
     
-    # Add security headers to all responses
-    @app.after_request
-    def security_headers(response):
-        return add_security_headers(response)
+    # Add security headers to all responses at the WSGI layer
+    app.wsgi_app = SecurityHeadersMiddleware(app.wsgi_app, build_security_headers(app.config))
     
     # Apply rate limiting to all requests
     @app.before_request
     def rate_limiting():
         return apply_rate_limits()
+    
+    # Free the concurrent-request slot taken by the rate limiter
+    app.teardown_request(release_concurrency_slot)
 
 def register_blueprints(app):
-    """Register all blueprints with the application."""
-    from routes.inventory import inventory_bp
-    from routes.experiment import experiment_bp
-    from routes.solvent import solvent_bp
-    from routes.molecules import molecules_bp
-    from routes.kit import kit_bp
-    from routes.uploads import uploads_bp
-    from routes.export import export_bp
-    from routes.experiment_import import import_bp
-    
-    app.register_blueprint(inventory_bp)
-    app.register_blueprint(experiment_bp)
-    app.register_blueprint(solvent_bp)
-    app.register_blueprint(molecules_bp)
-    app.register_blueprint(kit_bp)
-    app.register_blueprint(uploads_bp)
-    app.register_blueprint(export_bp)
-    app.register_blueprint(import_bp)
+    """Defer blueprint imports until the first request reaches the app.
+    
+    Route modules pull in pandas, openpyxl and RDKit, so importing them in
+    create_app() makes every cold start pay for all of them. URL matching
+    happens before any before_request hook runs, so the one-shot import is
+    done in a thin wrapper around wsgi_app instead.
+    """
+    app.extensions['blueprints_loaded'] = False
+    wsgi_app = app.wsgi_app
+    
+    def lazy_wsgi_app(environ, start_response):
+        if not app.extensions['blueprints_loaded']:
+            load_blueprints(app)
+        return wsgi_app(environ, start_response)
+    
+    app.wsgi_app = lazy_wsgi_app
+
+def load_blueprints(app):
+    """Import and register all route blueprints (no-op once loaded)."""
+    with _blueprint_lock:
+        if app.extensions.get('blueprints_loaded'):
+            return
+        for module_name, blueprint_name in BLUEPRINTS:
+            blueprint = getattr(import_module(module_name), blueprint_name)
+            app.register_blueprint(blueprint)
+        
+        # Compile the matcher now rather than inside the first request's match
+        app.url_map.update()
+        app.extensions['blueprints_loaded'] = True
+
+def bad_request(error):
+    """Handle bad request errors."""
+    message = str(error.description) if hasattr(error, 'description') else 'Invalid request'
+    body = BAD_REQUEST_TEMPLATE % json.dumps(message).encode()
+    return Response(body, status=400, mimetype='application/json')
+
+def not_found(error):
+    """Handle not found errors."""
+    return Response(NOT_FOUND_BODY, status=404, mimetype='application/json')
+
+@lru_cache(maxsize=None)
+def _too_large_body(max_content_length):
+    """Serialize the 413 payload once per configured size limit."""
+    return json.dumps({
+        'error': 'File Too Large',
+        'message': f'File size exceeds maximum allowed size of {max_content_length} bytes',
+        'status_code': 413
+    }).encode()
+
+def request_entity_too_large(error):
+    """Handle file too large errors."""
+    body = _too_large_body(current_app.config['MAX_CONTENT_LENGTH'])
+    return Response(body, status=413, mimetype='application/json')
+
+def service_unavailable(error):
+    """Handle service unavailable errors (e.g. too many experiment sessions)."""
+    message = str(error.description) if hasattr(error, 'description') else 'Service unavailable'
+    body = SERVICE_UNAVAILABLE_TEMPLATE % json.dumps(message).encode()
+    return Response(body, status=503, mimetype='application/json')
+
+def http_error(error):
+    """Handle any other HTTP error (405, 415, 429, ...) in the same JSON shape."""
+    body = json.dumps({
+        'error': error.name,
+        'message': error.description,
+        'status_code': error.code
+    }).encode()
+    response = Response(body, status=error.code, mimetype='application/json')
+    
+    # Keep headers such as Allow (405) and Retry-After (429)
+    for name, value in error.get_headers():
+        if name.lower() != 'content-type':
+            response.headers[name] = value
+    return response
+
+def internal_error(error):
+    """Handle internal server errors."""
+    # Unhandled exceptions are already logged by HTEFlask.log_exception
+    if getattr(error, 'original_exception', None) is None:
+        current_app.logger.error('Internal server error: %s', error)
+    return Response(INTERNAL_ERROR_BODY, status=500, mimetype='application/json')
+
+# Full tracebacks are logged once per (type, raising line) per window
+TRACEBACK_SAMPLE_WINDOW = 60  # seconds
+TRACEBACK_CACHE_SIZE = 512
+_traceback_log_times = OrderedDict()
+_traceback_lock = threading.Lock()
+
+def should_log_traceback(e):
+    """Return True unless the same exception from the same line was logged recently."""
+    tb = e.__traceback__
+    while tb is not None and tb.tb_next is not None:
+        tb = tb.tb_next
+    location = (tb.tb_frame.f_code.co_filename, tb.tb_lineno) if tb is not None else None
+    key = (type(e).__name__, location)
+    now = time.monotonic()
+    
+    with _traceback_lock:
+        last_logged = _traceback_log_times.get(key)
+        if last_logged is not None and now - last_logged < TRACEBACK_SAMPLE_WINDOW:
+            return False
+        _traceback_log_times[key] = now
+        _traceback_log_times.move_to_end(key)
+        if len(_traceback_log_times) > TRACEBACK_CACHE_SIZE:
+            _traceback_log_times.popitem(last=False)
+    return True
+
+ERROR_HANDLERS = (
+    (400, bad_request),
+    (404, not_found),
+    (413, request_entity_too_large),
+    (500, internal_error),
+    (503, service_unavailable),
+    (HTTPException, http_error),
+)
 
 def register_error_handlers(app):
     """Register error handlers for consistent error responses."""
-    
-    @app.errorhandler(400)
-    def bad_request(error):
-        """Handle bad request errors."""
-        return jsonify({
-            'error': 'Bad Request',
-            'message': str(error.description) if hasattr(error, 'description') else 'Invalid request',
-            'status_code': 400
-        }), 400
-    
-    @app.errorhandler(404)
-    def not_found(error):
-        """Handle not found errors."""
-        return jsonify({
-            'error': 'Not Found',
-            'message': 'The requested resource was not found',
-            'status_code': 404
-        }), 404
-    
-    @app.errorhandler(413)
-    def request_entity_too_large(error):
-        """Handle file too large errors."""
-        return jsonify({
-            'error': 'File Too Large',
-            'message': f'File size exceeds maximum allowed size of {app.config["MAX_CONTENT_LENGTH"]} bytes',
-            'status_code': 413
-        }), 413
-    
-    @app.errorhandler(500)
-    def internal_error(error):
-        """Handle internal server errors."""
-        app.logger.error(f'Internal server error: {error}')
-        return jsonify({
-            'error': 'Internal Server Error',
-            'message': 'An unexpected error occurred',
-            'status_code': 500
-        }), 500
-    
-    @app.errorhandler(Exception)
-    def handle_exception(e):
-        """Handle all unhandled exceptions."""
-        app.logger.error(f'Unhandled exception: {e}', exc_info=True)
-        return jsonify({
-            'error': 'Internal Server Error',
-            'message': 'An unexpected error occurred',
-            'status_code': 500
-        }), 500
-
-# Create the application instance
-app = create_app()
+    for code_or_exception, handler in ERROR_HANDLERS:
+        app.register_error_handler(code_or_exception, handler)
+
+def __getattr__(name):
+    """Build the default app on first access to `app.app` if it was not built at import."""
+    if name == 'app':
+        return create_app()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# Create the application instance (skipped when a server builds it via create_app(),
+# and in spawned worker processes, which re-import this module as __mp_main__)
+if os.environ.get('GUNICORN_PRELOAD') != 'skip' and multiprocessing.parent_process() is None:
+    app = create_app()
 
 if __name__ == '__main__':
+    app = create_app()
     app.run(debug=app.config['DEBUG'], port=5000)
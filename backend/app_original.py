@@ -2,9 +2,16 @@
 import os
 import io
 import base64
+import json
+import logging
 import tempfile
 from datetime import datetime
 import re
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
 
 # Third-party imports
 import pandas as pd
@@ -12,16 +19,33 @@ from flask import Flask, request, jsonify, send_file
 from flask_cors import CORS
 from openpyxl import Workbook
 from openpyxl.styles import Font, PatternFill
-from PIL import Image
 
-# Chemical informatics imports
-try:
-    from rdkit import Chem
-    from rdkit.Chem import Draw, AllChem
-    RDKIT_AVAILABLE = True
-except ImportError:
-    print("Warning: RDKit not available. Molecule rendering will be disabled.")
-    RDKIT_AVAILABLE = False
+# Local imports
+from utils.plates import WELL_NAMES, get_plate_config, get_plate_well_names
+
+logger = logging.getLogger(__name__)
+
+# Chemical informatics imports are deferred to load_rdkit(); RDKit takes
+# hundreds of milliseconds to import and only the molecule endpoints need it
+Chem = Draw = AllChem = rdMolDraw2D = None
+RDKIT_AVAILABLE = None  # Unknown until load_rdkit() runs
+CAIRO_AVAILABLE = False
+
+def load_rdkit():
+    """Import RDKit into the module globals on first call. Returns whether it is available."""
+    global Chem, Draw, AllChem, rdMolDraw2D, RDKIT_AVAILABLE, CAIRO_AVAILABLE
+    if RDKIT_AVAILABLE is None:
+        try:
+            from rdkit import Chem
+            from rdkit.Chem import Draw, AllChem
+            from rdkit.Chem.Draw import rdMolDraw2D
+            # Some RDKit builds are compiled without Cairo support
+            CAIRO_AVAILABLE = hasattr(rdMolDraw2D, 'MolDraw2DCairo')
+            RDKIT_AVAILABLE = True
+        except ImportError:
+            print("Warning: RDKit not available. Molecule rendering will be disabled.")
+            RDKIT_AVAILABLE = False
+    return RDKIT_AVAILABLE
 
 app = Flask(__name__)
 CORS(app)
@@ -69,13 +93,22 @@ def image_to_base64(img_or_bytes):
         return None
 
 def blank_png_base64(size=(300, 300)):
-    """Generate a blank PNG image as base64 string."""
+    """Generate a blank PNG image as base64 string (encoded once per size)."""
+    try:
+        return _blank_png_base64(tuple(size))
+    except TypeError:
+        # Unhashable size values from the request body; encode uncached
+        return _blank_png_base64.__wrapped__(size)
+
+@lru_cache(maxsize=32)
+def _blank_png_base64(size):
+    from PIL import Image
     img = Image.new("RGBA", size, (255, 255, 255, 0))
     return image_to_base64(img)
 
 def normalize_2d_coordinates(mol):
     """Normalize 2D coordinates for consistent rendering."""
-    if not RDKIT_AVAILABLE:
+    if not load_rdkit():
         return mol
     
     try:
@@ -87,7 +120,7 @@ def normalize_2d_coordinates(mol):
 
 def prepare_molecule(smiles_string):
     """Prepare molecule from SMILES string."""
-    if not RDKIT_AVAILABLE:
+    if not load_rdkit():
         return None
     
     try:
@@ -103,12 +136,19 @@ def prepare_molecule(smiles_string):
         return None
 
 def render_molecule_png(mol, image_size=(300, 300)):
-    """Render molecule as PNG bytes using RDKit's built-in PIL renderer."""
-    if not RDKIT_AVAILABLE or mol is None:
+    """Render molecule as PNG bytes using RDKit's Cairo drawer (PIL renderer as fallback)."""
+    if not load_rdkit() or mol is None:
         return None
     
     try:
-        # Use RDKit's PIL-based PNG drawer (no cairosvg needed)
+        # Cairo writes PNG bytes directly, skipping the PIL round-trip
+        if CAIRO_AVAILABLE:
+            drawer = rdMolDraw2D.MolDraw2DCairo(*image_size)
+            drawer.DrawMolecule(mol)
+            drawer.FinishDrawing()
+            return drawer.GetDrawingText()
+        
+        # Fall back to RDKit's PIL-based drawer
         img = Draw.MolToImage(mol, size=image_size)
         
         # Convert PIL image to PNG bytes
@@ -121,15 +161,39 @@ def render_molecule_png(mol, image_size=(300, 300)):
         print(f"[render_molecule_png] Error: {e}")
         return None
 
+@lru_cache(maxsize=4096)
+def canonical_smiles(smiles_string):
+    """Return RDKit's canonical SMILES, or the stripped input if it cannot be parsed."""
+    smiles_string = smiles_string.strip()
+    try:
+        mol = Chem.MolFromSmiles(smiles_string)
+        return Chem.MolToSmiles(mol) if mol is not None else smiles_string
+    except Exception:
+        return smiles_string
+
 def generate_molecule_image(smiles_string, image_size=(300, 300)):
     """
     Generate a 2D molecule image from a SMILES string.
     Returns: base64 encoded PNG image or None if error.
+    
+    Images are cached by canonical SMILES and size, so equivalent
+    inputs are only rendered once.
     """
-    if not RDKIT_AVAILABLE:
+    if not load_rdkit():
         print("[generate_molecule_image] RDKit not available")
         return blank_png_base64(image_size)
     
+    try:
+        return _generate_molecule_image_cached(canonical_smiles(smiles_string), tuple(image_size))
+    except TypeError:
+        # Unhashable size values from the request body; render uncached
+        return _generate_molecule_image(smiles_string, image_size)
+
+@lru_cache(maxsize=4096)
+def _generate_molecule_image_cached(smiles_string, image_size):
+    return _generate_molecule_image(smiles_string, image_size)
+
+def _generate_molecule_image(smiles_string, image_size):
     try:
         mol = prepare_molecule(smiles_string)
         if mol is None:
@@ -146,29 +210,97 @@ def generate_molecule_image(smiles_string, image_size=(300, 300)):
         print(f"[generate_molecule_image] Error with {smiles_string}: {e}")
         return blank_png_base64(image_size)
 
+# SDF uploads with fewer molecules than this are rendered in-process,
+# since starting worker processes costs more than it saves
+SDF_PARALLEL_MIN_MOLECULES = 16
+
+# One shared render pool for all uploads, created on first use. Workers are
+# spawned (not forked from a process running the log and inventory threads)
+SDF_RENDER_MAX_WORKERS = min(4, os.cpu_count() or 1)
+_sdf_executor = None
+_sdf_executor_lock = threading.Lock()
+
+def get_sdf_executor():
+    """Return the shared SDF render pool, creating it on first call."""
+    global _sdf_executor
+    with _sdf_executor_lock:
+        if _sdf_executor is None:
+            _sdf_executor = ProcessPoolExecutor(
+                max_workers=SDF_RENDER_MAX_WORKERS,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return _sdf_executor
+
+def render_sdf_image(molblock, image_size=(200, 200)):
+    """
+    Render a single SDF molecule (given as a molblock string) to a base64 PNG.
+    
+    Top-level so it can be pickled into a worker process; RDKit Mol objects
+    are not reliably picklable, molblocks are.
+    """
+    if not load_rdkit():
+        return None
+    
+    try:
+        mol = Chem.MolFromMolBlock(molblock)
+        if mol is None:
+            return None
+        
+        mol_2d = normalize_2d_coordinates(mol)
+        png_bytes = render_molecule_png(mol_2d, image_size)
+        return image_to_base64(png_bytes) if png_bytes else None
+    except Exception as e:
+        print(f"[render_sdf_image] Error: {e}")
+        return None
+
+def render_sdf_images(molblocks):
+    """Render molblocks to base64 PNGs, in a process pool for large batches. Preserves order."""
+    global _sdf_executor
+    if len(molblocks) >= SDF_PARALLEL_MIN_MOLECULES and SDF_RENDER_MAX_WORKERS > 1:
+        executor = get_sdf_executor()
+        try:
+            return list(executor.map(render_sdf_image, molblocks, chunksize=8))
+        except BrokenProcessPool as e:
+            # Replace the dead pool on the next large upload
+            with _sdf_executor_lock:
+                if _sdf_executor is executor:
+                    _sdf_executor = None
+            print(f"[render_sdf_images] Process pool failed, rendering sequentially: {e}")
+        except Exception as e:
+            print(f"[render_sdf_images] Process pool failed, rendering sequentially: {e}")
+    
+    return [render_sdf_image(molblock) for molblock in molblocks]
+
 def parse_sdf_file(sdf_content):
     """
     Parse SDF file content and extract molecules with images.
     
     Args:
-        sdf_content (str): The content of the SDF file
+        sdf_content (str or binary file object): The content of the SDF file,
+            or a stream of it, which is read one molecule at a time
     
     Returns:
         list: List of molecule dictionaries with name, smiles, and image
     """
-    if not RDKIT_AVAILABLE:
+    if not load_rdkit():
         print("[parse_sdf_file] RDKit not available")
         return []
     
     molecules = []
+    molblocks = []
     
     try:
-        print(f"[parse_sdf_file] Processing SDF content, length: {len(sdf_content)}")
-        
-        # Use RDKit to parse SDF
-        mol_supplier = Chem.SDMolSupplier()
-        mol_supplier.SetData(sdf_content)
+        # Use RDKit to parse SDF; streams are parsed as they are read, without
+        # holding the whole file as a string
+        if isinstance(sdf_content, str):
+            print(f"[parse_sdf_file] Processing SDF content, length: {len(sdf_content)}")
+            mol_supplier = Chem.SDMolSupplier()
+            mol_supplier.SetData(sdf_content)
+        else:
+            print("[parse_sdf_file] Processing SDF stream")
+            mol_supplier = Chem.ForwardSDMolSupplier(sdf_content)
         
+        # First pass: collect names, SMILES and molblocks; rendering happens in bulk below
         for i, mol in enumerate(mol_supplier):
             if mol is None:
                 print(f"[parse_sdf_file] Skipping invalid molecule at index {i}")
@@ -180,30 +312,24 @@ def parse_sdf_file(sdf_content):
                 
                 # Generate SMILES
                 smiles = Chem.MolToSmiles(mol)
+                molblock = Chem.MolToMolBlock(mol)
                 
-                # Generate molecule image
-                image_size = (200, 200)  # Smaller size for table display
-                mol_2d = normalize_2d_coordinates(mol)
-                png_bytes = render_molecule_png(mol_2d, image_size)
-                
-                image_base64 = None
-                if png_bytes:
-                    image_base64 = image_to_base64(png_bytes)
-                
-                molecule_data = {
+                molecules.append({
                     'name': mol_name,
                     'smiles': smiles,
-                    'image': image_base64,
+                    'image': None,
                     'role': ''  # Will be set by user
-                }
-                
-                molecules.append(molecule_data)
-                print(f"[parse_sdf_file] Processed molecule {i+1}: {mol_name}")
+                })
+                molblocks.append(molblock)
                 
             except Exception as e:
                 print(f"[parse_sdf_file] Error processing molecule {i+1}: {e}")
                 continue
         
+        # Generate molecule images (smaller size for table display)
+        for molecule_data, image_base64 in zip(molecules, render_sdf_images(molblocks)):
+            molecule_data['image'] = image_base64
+        
         print(f"[parse_sdf_file] Successfully processed {len(molecules)} molecules")
         return molecules
         
@@ -1480,15 +1606,59 @@ def apply_kit_design_to_procedure(design, position, kit_size, current_procedure,
     # Convert back to list format
     return list(procedure_dict.values())
 
+# Kit origins (first row, first column) on a 96-well plate for the named
+# positions; a kit is placed once per origin
+KIT_POSITION_ORIGINS = {
+    'top-left': [('A', 1)],
+    'top-right': [('A', 7)],
+    'bottom-left': [('E', 1)],
+    'bottom-right': [('E', 7)],
+    'all-quadrants': [('A', 1), ('A', 7), ('E', 1), ('E', 7)],
+    'top-quadrants': [('A', 1), ('A', 7)],
+    'bottom-quadrants': [('E', 1), ('E', 7)],
+    'left-quadrants': [('A', 1), ('E', 1)],
+    'right-quadrants': [('A', 7), ('E', 7)],
+}
+
+def parse_kit_wells(kit_wells):
+    """Split kit wells like "B12" into (well, row letter, column number), skipping malformed names."""
+    return [(well, well[0], int(well[1:])) for well in kit_wells if len(well) >= 2]
+
 def calculate_well_mappings(position, kit_size, destination_plate='96'):
+    """
+    Calculate well mappings based on position and kit size.
+    
+    The mapping depends only on the position, the kit's wells and the destination
+    plate, so results are memoized on those; each caller gets its own copy.
+    """
+    try:
+        # Flexible positions are dicts; key them by their canonical JSON form
+        if isinstance(position, dict):
+            position_key = ('json', json.dumps(position, sort_keys=True))
+        else:
+            position_key = ('value', position)
+        mappings = _calculate_well_mappings_cached(position_key, tuple(kit_size.get('wells', [])), destination_plate)
+    except TypeError:
+        # Unhashable or non-JSON input: compute without the cache
+        mappings = _calculate_well_mappings(position, kit_size, destination_plate)
+    return {well: list(targets) for well, targets in mappings.items()}
+
+@lru_cache(maxsize=256)
+def _calculate_well_mappings_cached(position_key, kit_wells, destination_plate):
+    """Memoized _calculate_well_mappings() keyed by calculate_well_mappings()."""
+    kind, value = position_key
+    position = json.loads(value) if kind == 'json' else value
+    return _calculate_well_mappings(position, {'wells': list(kit_wells)}, destination_plate)
+
+def _calculate_well_mappings(position, kit_size, destination_plate='96'):
     """Calculate well mappings based on position and kit size"""
     kit_wells = kit_size.get('wells', [])
     mappings = {}
     
-    print(f"Calculating well mappings for position: {position}")
-    print(f"Destination plate: {destination_plate}")
-    print(f"Kit size: {kit_size}")
-    print(f"Kit wells: {kit_wells}")
+    logger.debug("Calculating well mappings for position: %s", position)
+    logger.debug("Destination plate: %s", destination_plate)
+    logger.debug("Kit size: %s", kit_size)
+    logger.debug("Kit wells: %s", kit_wells)
     
     if not kit_wells:
         return mappings
@@ -1498,232 +1668,57 @@ def calculate_well_mappings(position, kit_size, destination_plate='96'):
         return calculate_flexible_well_mappings(position, kit_size, destination_plate)
     
     # Parse kit wells to understand the layout
-    kit_rows = set()
-    kit_cols = set()
-    
-    for well in kit_wells:
-        if len(well) >= 2:
-            row_letter = well[0]
-            col_number = int(well[1:])
-            kit_rows.add(row_letter)
-            kit_cols.add(col_number)
-    
-    kit_rows = sorted(list(kit_rows))
-    kit_cols = sorted(list(kit_cols))
-    
-    print(f"Parsed kit rows: {kit_rows}")
-    print(f"Parsed kit cols: {kit_cols}")
-    
-    # Handle different position types
-    if position == "top-left":
-        # Map to A1-D6 region
-        for well in kit_wells:
-            row_letter = well[0]
-            col_number = int(well[1:])
-            
-            # Calculate offset within kit
-            row_offset = kit_rows.index(row_letter)
-            col_offset = kit_cols.index(col_number)
-            
-            # Map to target position
-            target_row = chr(ord('A') + row_offset)
-            target_col = 1 + col_offset
-            
-            mappings[well] = [f"{target_row}{target_col}"]
-    
-    elif position == "top-right":
-        # Map to A7-D12 region
-        for well in kit_wells:
-            row_letter = well[0]
-            col_number = int(well[1:])
-            
-            row_offset = kit_rows.index(row_letter)
-            col_offset = kit_cols.index(col_number)
-            
-            target_row = chr(ord('A') + row_offset)
-            target_col = 7 + col_offset
-            
-            mappings[well] = [f"{target_row}{target_col}"]
-    
-    elif position == "bottom-left":
-        # Map to E1-H6 region
-        for well in kit_wells:
-            row_letter = well[0]
-            col_number = int(well[1:])
-            
-            row_offset = kit_rows.index(row_letter)
-            col_offset = kit_cols.index(col_number)
-            
-            target_row = chr(ord('E') + row_offset)
-            target_col = 1 + col_offset
-            
-            mappings[well] = [f"{target_row}{target_col}"]
-    
-    elif position == "bottom-right":
-        # Map to E7-H12 region
-        for well in kit_wells:
-            row_letter = well[0]
-            col_number = int(well[1:])
-            
-            row_offset = kit_rows.index(row_letter)
-            col_offset = kit_cols.index(col_number)
-            
-            target_row = chr(ord('E') + row_offset)
-            target_col = 7 + col_offset
-            
-            mappings[well] = [f"{target_row}{target_col}"]
-    
-    elif position == "all-quadrants":
-        # Map to all 4 quadrants
-        for well in kit_wells:
-            row_letter = well[0]
-            col_number = int(well[1:])
-            
-            row_offset = kit_rows.index(row_letter)
-            col_offset = kit_cols.index(col_number)
-            
-            target_wells = []
-            # Top-left
-            target_wells.append(f"{chr(ord('A') + row_offset)}{1 + col_offset}")
-            # Top-right
-            target_wells.append(f"{chr(ord('A') + row_offset)}{7 + col_offset}")
-            # Bottom-left
-            target_wells.append(f"{chr(ord('E') + row_offset)}{1 + col_offset}")
-            # Bottom-right
-            target_wells.append(f"{chr(ord('E') + row_offset)}{7 + col_offset}")
-            
-            mappings[well] = target_wells
-    
+    parsed_wells = parse_kit_wells(kit_wells)
+    kit_rows = sorted({row_letter for _, row_letter, _ in parsed_wells})
+    kit_cols = sorted({col_number for _, _, col_number in parsed_wells})
+    
+    # Offset of each kit row/column within the kit, for O(1) lookups per well
+    row_offsets = {row: i for i, row in enumerate(kit_rows)}
+    col_offsets = {col: i for i, col in enumerate(kit_cols)}
+    
+    logger.debug("Parsed kit rows: %s", kit_rows)
+    logger.debug("Parsed kit cols: %s", kit_cols)
+    
+    # Resolve the position to the plate origin (first row, first column) of each
+    # copy of the kit. Row/column positions pin one coordinate instead: every well
+    # goes to that row (or column) and only the other coordinate is offset.
+    offset_rows = offset_cols = True
+    origins = []
+    if position in KIT_POSITION_ORIGINS:
+        origins = KIT_POSITION_ORIGINS[position]
     elif position.startswith("row-"):
         # Full row positioning
         target_row = position.split("-")[1]
-        print(f"Row positioning: target_row = {target_row}")
-        for well in kit_wells:
-            # Extract column number from well (e.g., "A1" -> 1, "A12" -> 12)
-            col_number = int(well[1:])
-            # Find the position of this column in the sorted kit columns
-            col_offset = kit_cols.index(col_number)
-            # Map to the target position starting from column 1
-            target_col = 1 + col_offset
-            print(f"Mapping well {well} (col {col_number}, offset {col_offset}) -> {target_row}{target_col}")
-            mappings[well] = [f"{target_row}{target_col}"]
-    
+        logger.debug("Row positioning: target_row = %s", target_row)
+        origins = [(target_row, 1)]
+        offset_rows = False
     elif position.startswith("col-"):
         # Full column positioning
-        target_col = int(position.split("-")[1])
-        for well in kit_wells:
-            row_letter = well[0]
-            row_offset = kit_rows.index(row_letter)
-            target_row = chr(ord('A') + row_offset)
-            mappings[well] = [f"{target_row}{target_col}"]
-    
-    elif position == "top-quadrants":
-        # Map to top 2 quadrants (A1-D6 and A7-D12)
-        for well in kit_wells:
-            row_letter = well[0]
-            col_number = int(well[1:])
-            
-            row_offset = kit_rows.index(row_letter)
-            col_offset = kit_cols.index(col_number)
-            
-            target_wells = []
-            # Top-left
-            target_wells.append(f"{chr(ord('A') + row_offset)}{1 + col_offset}")
-            # Top-right
-            target_wells.append(f"{chr(ord('A') + row_offset)}{7 + col_offset}")
-            
-            mappings[well] = target_wells
-    
-    elif position == "bottom-quadrants":
-        # Map to bottom 2 quadrants (E1-H6 and E7-H12)
-        for well in kit_wells:
-            row_letter = well[0]
-            col_number = int(well[1:])
-            
-            row_offset = kit_rows.index(row_letter)
-            col_offset = kit_cols.index(col_number)
-            
-            target_wells = []
-            # Bottom-left
-            target_wells.append(f"{chr(ord('E') + row_offset)}{1 + col_offset}")
-            # Bottom-right
-            target_wells.append(f"{chr(ord('E') + row_offset)}{7 + col_offset}")
-            
-            mappings[well] = target_wells
-    
-    elif position == "left-quadrants":
-        # Map to left 2 quadrants (A1-D6 and E1-H6)
-        for well in kit_wells:
-            row_letter = well[0]
-            col_number = int(well[1:])
-            
-            row_offset = kit_rows.index(row_letter)
-            col_offset = kit_cols.index(col_number)
-            
-            target_wells = []
-            # Top-left
-            target_wells.append(f"{chr(ord('A') + row_offset)}{1 + col_offset}")
-            # Bottom-left
-            target_wells.append(f"{chr(ord('E') + row_offset)}{1 + col_offset}")
-            
-            mappings[well] = target_wells
-    
-    elif position == "right-quadrants":
-        # Map to right 2 quadrants (A7-D12 and E7-H12)
-        for well in kit_wells:
-            row_letter = well[0]
-            col_number = int(well[1:])
-            
-            row_offset = kit_rows.index(row_letter)
-            col_offset = kit_cols.index(col_number)
-            
-            target_wells = []
-            # Top-right
-            target_wells.append(f"{chr(ord('A') + row_offset)}{7 + col_offset}")
-            # Bottom-right
-            target_wells.append(f"{chr(ord('E') + row_offset)}{7 + col_offset}")
-            
-            mappings[well] = target_wells
-    
+        origins = [('A', int(position.split("-")[1]))]
+        offset_cols = False
     elif position.startswith("rows-"):
         # Multiple row positioning (e.g., "rows-A-D")
         parts = position.split("-")
         if len(parts) >= 3:
-            start_row = parts[1]
-            end_row = parts[2]
-            start_row_idx = ord(start_row) - ord('A')
-            
-            for well in kit_wells:
-                row_letter = well[0]
-                col_number = int(well[1:])
-                
-                row_offset = kit_rows.index(row_letter)
-                col_offset = kit_cols.index(col_number)
-                
-                target_row = chr(ord('A') + start_row_idx + row_offset)
-                target_col = 1 + col_offset
-                
-                mappings[well] = [f"{target_row}{target_col}"]
-    
+            origins = [(parts[1], 1)]
     elif position.startswith("cols-"):
         # Multiple column positioning (e.g., "cols-1-6")
         parts = position.split("-")
         if len(parts) >= 3:
-            start_col = int(parts[1])
+            origins = [('A', int(parts[1]))]
+    
+    if origins:
+        for well, row_letter, col_number in parsed_wells:
+            # Pinned coordinates are not offset
+            row_offset = row_offsets[row_letter] if offset_rows else 0
+            col_offset = col_offsets[col_number] if offset_cols else 0
             
-            for well in kit_wells:
-                row_letter = well[0]
-                col_number = int(well[1:])
-                
-                row_offset = kit_rows.index(row_letter)
-                col_offset = kit_cols.index(col_number)
-                
-                target_row = chr(ord('A') + row_offset)
-                target_col = start_col + col_offset
-                
-                mappings[well] = [f"{target_row}{target_col}"]
+            mappings[well] = [
+                f"{chr(ord(origin_row) + row_offset) if offset_rows else origin_row}{origin_col + col_offset}"
+                for origin_row, origin_col in origins
+            ]
     
-    print(f"Final mappings: {mappings}")
+    logger.debug("Final mappings: %s", mappings)
     return mappings
 
 def calculate_flexible_well_mappings(position_data, kit_size, destination_plate='96'):
@@ -1734,66 +1729,48 @@ def calculate_flexible_well_mappings(position_data, kit_size, destination_plate=
     if not kit_wells:
         return mappings
     
+    # Zero-based row/column offset of each well from the kit origin (A1), computed once
+    well_offsets = [(well, ord(row_letter) - ord('A'), col_number - 1)
+                    for well, row_letter, col_number in parse_kit_wells(kit_wells)]
+    
     strategy = position_data.get('strategy', 'exact_placement')
     positions = position_data.get('positions', [])
     kit_rows = position_data.get('kit_size', {}).get('rows', 1)
     kit_cols = position_data.get('kit_size', {}).get('cols', 1)
     
-    print(f"Flexible positioning - Strategy: {strategy}")
-    print(f"Positions: {positions}")
-    print(f"Kit dimensions: {kit_rows}x{kit_cols}")
+    logger.debug("Flexible positioning - Strategy: %s", strategy)
+    logger.debug("Positions: %s", positions)
+    logger.debug("Kit dimensions: %sx%s", kit_rows, kit_cols)
     
     # Get destination plate config
-    plate_configs = {
-        '24': {'rows': 4, 'cols': 6},
-        '48': {'rows': 6, 'cols': 8}, 
-        '96': {'rows': 8, 'cols': 12}
-    }
-    plate_config = plate_configs.get(destination_plate, plate_configs['96'])
+    plate_config = get_plate_config(destination_plate)
     
     if strategy == 'exact_placement':
-        # Kit matches plate exactly or default A1 placement
-        start_row = 'A'
-        start_col = 1
+        # Kit matches plate exactly or default A1 placement: each well maps to
+        # itself, so the offsets from A1 index the destination directly
+        plate_rows = plate_config['rows']
+        plate_cols = plate_config['cols']
         
-        for well in kit_wells:
-            if len(well) >= 2:
-                kit_row_letter = well[0]
-                kit_col_number = int(well[1:])
-                
-                # Calculate offset from kit origin
-                kit_row_offset = ord(kit_row_letter) - ord('A')
-                kit_col_offset = kit_col_number - 1
-                
-                # Map to destination
-                dest_row = chr(ord(start_row) + kit_row_offset)
-                dest_col = start_col + kit_col_offset
-                
-                if dest_row <= chr(ord('A') + plate_config['rows'] - 1) and dest_col <= plate_config['cols']:
-                    mappings[well] = [f"{dest_row}{dest_col}"]
+        for well, kit_row_offset, kit_col_offset in well_offsets:
+            if 0 <= kit_row_offset < plate_rows and 0 <= kit_col_offset < plate_cols:
+                mappings[well] = [WELL_NAMES[kit_row_offset][kit_col_offset]]
     
     elif strategy == 'row_placement':
         # Map kit to specific rows
         for position_id in positions:
             if position_id.startswith('row-'):
                 target_start_row = position_id.split('-')[1]
+                start_row_index = ord(target_start_row) - ord('A')
                 
-                for well in kit_wells:
-                    if len(well) >= 2:
-                        kit_row_letter = well[0]
-                        kit_col_number = int(well[1:])
-                        
-                        # Calculate kit row offset from kit's starting row
-                        kit_row_offset = ord(kit_row_letter) - ord('A')
-                        
-                        # Map to destination starting from target_start_row
-                        dest_row = chr(ord(target_start_row) + kit_row_offset)
-                        dest_col = kit_col_number
-                        
-                        if ord(dest_row) <= ord('A') + plate_config['rows'] - 1 and dest_col <= plate_config['cols']:
-                            if well not in mappings:
-                                mappings[well] = []
-                            mappings[well].append(f"{dest_row}{dest_col}")
+                for well, kit_row_offset, kit_col_offset in well_offsets:
+                    # Map to destination starting from target_start_row
+                    dest_row_index = start_row_index + kit_row_offset
+                    dest_col = kit_col_offset + 1
+                    
+                    if 0 <= dest_row_index < plate_config['rows'] and 1 <= dest_col <= plate_config['cols']:
+                        if well not in mappings:
+                            mappings[well] = []
+                        mappings[well].append(WELL_NAMES[dest_row_index][dest_col - 1])
     
     elif strategy == 'col_placement':
         # Map kit to specific columns
@@ -1801,22 +1778,14 @@ def calculate_flexible_well_mappings(position_data, kit_size, destination_plate=
             if position_id.startswith('col-'):
                 target_start_col = int(position_id.split('-')[1])
                 
-                for well in kit_wells:
-                    if len(well) >= 2:
-                        kit_row_letter = well[0]
-                        kit_col_number = int(well[1:])
-                        
-                        # Calculate kit column offset from kit's starting column
-                        kit_col_offset = kit_col_number - 1
-                        
-                        # Map to destination starting from target_start_col
-                        dest_row = kit_row_letter
-                        dest_col = target_start_col + kit_col_offset
-                        
-                        if ord(dest_row) <= ord('A') + plate_config['rows'] - 1 and dest_col <= plate_config['cols']:
-                            if well not in mappings:
-                                mappings[well] = []
-                            mappings[well].append(f"{dest_row}{dest_col}")
+                for well, kit_row_offset, kit_col_offset in well_offsets:
+                    # Map to destination starting from target_start_col
+                    dest_col = target_start_col + kit_col_offset
+                    
+                    if 0 <= kit_row_offset < plate_config['rows'] and 1 <= dest_col <= plate_config['cols']:
+                        if well not in mappings:
+                            mappings[well] = []
+                        mappings[well].append(WELL_NAMES[kit_row_offset][dest_col - 1])
     
     elif strategy == 'quadrant_placement':
         # Map kit to specific quadrants (adjust based on destination plate)
@@ -1838,23 +1807,15 @@ def calculate_flexible_well_mappings(position_data, kit_size, destination_plate=
             if position_id in quadrant_offsets:
                 row_offset, col_offset = quadrant_offsets[position_id]
                 
-                for well in kit_wells:
-                    if len(well) >= 2:
-                        kit_row_letter = well[0]
-                        kit_col_number = int(well[1:])
-                        
-                        # Calculate offset from kit origin
-                        kit_row_offset = ord(kit_row_letter) - ord('A')
-                        kit_col_offset = kit_col_number - 1
-                        
-                        # Map to destination quadrant
-                        dest_row = chr(ord('A') + row_offset + kit_row_offset)
-                        dest_col = 1 + col_offset + kit_col_offset
-                        
-                        if ord(dest_row) <= ord('A') + plate_config['rows'] - 1 and dest_col <= plate_config['cols']:
-                            if well not in mappings:
-                                mappings[well] = []
-                            mappings[well].append(f"{dest_row}{dest_col}")
+                for well, kit_row_offset, kit_col_offset in well_offsets:
+                    # Map to destination quadrant
+                    dest_row_index = row_offset + kit_row_offset
+                    dest_col = 1 + col_offset + kit_col_offset
+                    
+                    if 0 <= dest_row_index < plate_config['rows'] and 1 <= dest_col <= plate_config['cols']:
+                        if well not in mappings:
+                            mappings[well] = []
+                        mappings[well].append(WELL_NAMES[dest_row_index][dest_col - 1])
     
     elif strategy == 'row_pair_placement':
         # Map kit to specific row pairs (for 2x12 kits)
@@ -1869,22 +1830,15 @@ def calculate_flexible_well_mappings(position_data, kit_size, destination_plate=
             if position_id in row_pair_offsets:
                 row_offset = row_pair_offsets[position_id]
                 
-                for well in kit_wells:
-                    if len(well) >= 2:
-                        kit_row_letter = well[0]
-                        kit_col_number = int(well[1:])
-                        
-                        # Calculate offset from kit origin
-                        kit_row_offset = ord(kit_row_letter) - ord('A')
-                        
-                        # Map to destination row pair
-                        dest_row = chr(ord('A') + row_offset + kit_row_offset)
-                        dest_col = kit_col_number
-                        
-                        if ord(dest_row) <= ord('A') + plate_config['rows'] - 1 and dest_col <= plate_config['cols']:
-                            if well not in mappings:
-                                mappings[well] = []
-                            mappings[well].append(f"{dest_row}{dest_col}")
+                for well, kit_row_offset, kit_col_offset in well_offsets:
+                    # Map to destination row pair
+                    dest_row_index = row_offset + kit_row_offset
+                    dest_col = kit_col_offset + 1
+                    
+                    if 0 <= dest_row_index < plate_config['rows'] and 1 <= dest_col <= plate_config['cols']:
+                        if well not in mappings:
+                            mappings[well] = []
+                        mappings[well].append(WELL_NAMES[dest_row_index][dest_col - 1])
     
     elif strategy == 'half_placement':
         # Map kit to upper or lower half (for 4x12 kits)
@@ -1897,22 +1851,15 @@ def calculate_flexible_well_mappings(position_data, kit_size, destination_plate=
             if position_id in half_offsets:
                 row_offset = half_offsets[position_id]
                 
-                for well in kit_wells:
-                    if len(well) >= 2:
-                        kit_row_letter = well[0]
-                        kit_col_number = int(well[1:])
-                        
-                        # Calculate offset from kit origin
-                        kit_row_offset = ord(kit_row_letter) - ord('A')
-                        
-                        # Map to destination half
-                        dest_row = chr(ord('A') + row_offset + kit_row_offset)
-                        dest_col = kit_col_number
-                        
-                        if ord(dest_row) <= ord('A') + plate_config['rows'] - 1 and dest_col <= plate_config['cols']:
-                            if well not in mappings:
-                                mappings[well] = []
-                            mappings[well].append(f"{dest_row}{dest_col}")
+                for well, kit_row_offset, kit_col_offset in well_offsets:
+                    # Map to destination half
+                    dest_row_index = row_offset + kit_row_offset
+                    dest_col = kit_col_offset + 1
+                    
+                    if 0 <= dest_row_index < plate_config['rows'] and 1 <= dest_col <= plate_config['cols']:
+                        if well not in mappings:
+                            mappings[well] = []
+                        mappings[well].append(WELL_NAMES[dest_row_index][dest_col - 1])
 
     elif strategy == 'block_placement':
         # Map kit to specific blocks/quadrants
@@ -1921,26 +1868,19 @@ def calculate_flexible_well_mappings(position_data, kit_size, destination_plate=
         for block in blocks:
             start_row = block.get('startRow', 'A')
             start_col = block.get('startCol', 1)
+            start_row_index = ord(start_row) - ord('A')
             
-            for well in kit_wells:
-                if len(well) >= 2:
-                    kit_row_letter = well[0]
-                    kit_col_number = int(well[1:])
-                    
-                    # Calculate offset from kit origin
-                    kit_row_offset = ord(kit_row_letter) - ord('A')
-                    kit_col_offset = kit_col_number - 1
-                    
-                    # Map to destination block
-                    dest_row = chr(ord(start_row) + kit_row_offset)
-                    dest_col = start_col + kit_col_offset
-                    
-                    if ord(dest_row) <= ord('A') + plate_config['rows'] - 1 and dest_col <= plate_config['cols']:
-                        if well not in mappings:
-                            mappings[well] = []
-                        mappings[well].append(f"{dest_row}{dest_col}")
+            for well, kit_row_offset, kit_col_offset in well_offsets:
+                # Map to destination block
+                dest_row_index = start_row_index + kit_row_offset
+                dest_col = start_col + kit_col_offset
+                
+                if 0 <= dest_row_index < plate_config['rows'] and 1 <= dest_col <= plate_config['cols']:
+                    if well not in mappings:
+                        mappings[well] = []
+                    mappings[well].append(WELL_NAMES[dest_row_index][dest_col - 1])
     
-    print(f"Flexible mappings result: {mappings}")
+    logger.debug("Flexible mappings result: %s", mappings)
     return mappings
 
 @app.route('/api/experiment/procedure/update-plate-type', methods=['POST'])
@@ -1962,25 +1902,10 @@ def update_procedure_plate_type():
         current_experiment['context']['plate_type'] = new_plate_type
         
         # Validate that all wells in current procedure fit in the new plate type
-        plate_configs = {
-            '24': {'max_row': 'D', 'max_col': 6},
-            '48': {'max_row': 'F', 'max_col': 8},
-            '96': {'max_row': 'H', 'max_col': 12}
-        }
-        
-        plate_config = plate_configs.get(new_plate_type, plate_configs['96'])
+        plate_wells = get_plate_well_names(new_plate_type)
         
         # Filter out any procedure entries that don't fit in the new plate
-        valid_procedure = []
-        for entry in current_procedure:
-            well = entry.get('well', '')
-            if well and len(well) >= 2:
-                row_letter = well[0]
-                col_number = int(well[1:]) if well[1:].isdigit() else 0
-                
-                if (row_letter <= plate_config['max_row'] and 
-                    col_number <= plate_config['max_col']):
-                    valid_procedure.append(entry)
+        valid_procedure = [entry for entry in current_procedure if entry.get('well', '') in plate_wells]
         
         # Update the procedure with valid entries
         current_experiment['procedure'] = valid_procedure
@@ -2009,12 +1934,9 @@ def experiment_results():
 @app.route('/api/experiment/export', methods=['POST'])
 def export_experiment():
     """Export experiment data to Excel format"""
-    # Create a new workbook
-    wb = Workbook()
-    
-    # Remove default sheet
-    if wb.active:
-        wb.remove(wb.active)
+    # Create a new workbook; rows are only appended, so it is written in
+    # write-only mode (no default sheet to remove)
+    wb = Workbook(write_only=True)
     
     # Context sheet
     ws_context = wb.create_sheet("Context")
@@ -2283,10 +2205,10 @@ def export_experiment():
     ws_procedure_settings.append(['Remarks'])
     ws_procedure_settings.append([current_experiment.get('procedure_settings', {}).get('analyticalDetails', {}).get('remarks', '')])
     
-    # Save to temporary file
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as tmp:
-        wb.save(tmp.name)
-        tmp_path = tmp.name
+    # Save straight into memory; a temporary file would be left behind on disk
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    buffer.seek(0)
     
     # Generate filename based on ELN number or timestamp
     context = current_experiment.get('context', {})
@@ -2300,7 +2222,12 @@ def export_experiment():
         # Fallback to original timestamp format
         filename = f'HTE_experiment_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
     
-    return send_file(tmp_path, as_attachment=True, download_name=filename)
+    return send_file(
+        buffer,
+        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        as_attachment=True,
+        download_name=filename
+    )
 
 @app.route('/api/molecule/image', methods=['POST'])
 def get_molecule_image():
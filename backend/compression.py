@@ -0,0 +1,50 @@
+"""
+Response compression for HTE App.
+Gzips large JSON responses for clients that accept it (config: COMPRESS_*).
+"""
+import gzip
+from flask import current_app, request
+
+def compress_response(response, mimetypes, min_size, level):
+    """Gzip a buffered response body in place when the client accepts gzip."""
+    if (response.direct_passthrough
+            or response.is_streamed
+            or response.status_code < 200
+            or response.status_code in (204, 304)
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in mimetypes):
+        return response
+    
+    # Caches must keep gzipped and plain bodies apart
+    response.vary.add('Accept-Encoding')
+    if request.accept_encodings['gzip'] <= 0:
+        return response
+    
+    body = response.get_data()
+    if len(body) < min_size:
+        return response
+    
+    response.set_data(gzip.compress(body, compresslevel=level))
+    response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+def accepts_gzip():
+    """Whether this app compresses responses and the client accepts gzip."""
+    return current_app.extensions.get('compression', False) and request.accept_encodings['gzip'] > 0
+
+def gzipped_response(response):
+    """Label a response whose body is already gzipped, e.g. from a cache; compress_response() skips it."""
+    response.headers['Content-Encoding'] = 'gzip'
+    response.vary.add('Accept-Encoding')
+    return response
+
+def init_compression(app):
+    """Compress the app's responses per its COMPRESS_* settings."""
+    app.extensions['compression'] = True
+    mimetypes = frozenset(app.config['COMPRESS_MIMETYPES'])
+    min_size = app.config['COMPRESS_MIN_SIZE']
+    level = app.config['COMPRESS_LEVEL']
+    
+    @app.after_request
+    def gzip_response(response):
+        return compress_response(response, mimetypes, min_size, level)
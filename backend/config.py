@@ -3,6 +3,7 @@ Configuration module for HTE App backend.
 Provides environment-driven configuration with sensible defaults.
 """
 import os
+from functools import lru_cache
 from pathlib import Path
 
 class Config:
@@ -12,6 +13,8 @@ class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-change-in-production'
     DEBUG = os.environ.get('FLASK_DEBUG', 'False').lower() == 'true'
     TESTING = False
+    # Unhandled exceptions become JSON 500s in debug and testing too
+    PROPAGATE_EXCEPTIONS = False
     
     # File upload settings
     MAX_CONTENT_LENGTH = int(os.environ.get('MAX_CONTENT_LENGTH', 25 * 1024 * 1024))  # 25MB default
@@ -20,8 +23,8 @@ class Config:
     
     # CORS settings
     CORS_ORIGINS = os.environ.get('CORS_ORIGINS', '*').split(',')
-    CORS_METHODS = ['GET', 'POST', 'PUT', 'DELETE', 'OPTIONS']
-    CORS_HEADERS = ['Content-Type', 'Authorization']
+    CORS_METHODS = ['GET', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS']
+    CORS_HEADERS = ['Content-Type', 'Authorization', 'X-Session-Id']
     
     # Data file paths
     DATA_ROOT_PATH = os.environ.get('DATA_ROOT_PATH', os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -35,11 +38,22 @@ class Config:
     # Logging settings
     LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
     LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    LOG_DIR = os.environ.get('LOG_DIR', 'logs')
+    LOG_MAX_BYTES = int(os.environ.get('LOG_MAX_BYTES', 10 * 1024 * 1024))  # 10MB per file
+    LOG_BACKUP_COUNT = int(os.environ.get('LOG_BACKUP_COUNT', 10))
+    LOG_BUFFER_CAPACITY = int(os.environ.get('LOG_BUFFER_CAPACITY', 1024))  # records held before flush
+    LOG_FLUSH_INTERVAL = float(os.environ.get('LOG_FLUSH_INTERVAL', 30))  # seconds
     
     # Cache settings
     CACHE_ENABLED = os.environ.get('CACHE_ENABLED', 'True').lower() == 'true'
     CACHE_TTL = int(os.environ.get('CACHE_TTL', 300))  # 5 minutes default
     
+    # Response compression (gzip for clients that accept it)
+    COMPRESS_ENABLED = os.environ.get('COMPRESS_ENABLED', 'True').lower() == 'true'
+    COMPRESS_MIMETYPES = ['application/json']
+    COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))  # bytes
+    COMPRESS_LEVEL = int(os.environ.get('COMPRESS_LEVEL', 6))  # 1 (fastest) - 9 (smallest)
+    
     # Pagination settings
     DEFAULT_PAGE_SIZE = int(os.environ.get('DEFAULT_PAGE_SIZE', 100))
     MAX_PAGE_SIZE = int(os.environ.get('MAX_PAGE_SIZE', 1000))
@@ -55,6 +69,10 @@ class Config:
     API_RATE_WINDOW = int(os.environ.get('API_RATE_WINDOW', 60))  # seconds
     UPLOAD_RATE_LIMIT = int(os.environ.get('UPLOAD_RATE_LIMIT', 10))  # uploads per 5 min
     UPLOAD_RATE_WINDOW = int(os.environ.get('UPLOAD_RATE_WINDOW', 300))  # seconds
+    RATE_LIMIT_MODE = os.environ.get('RATE_LIMIT_MODE', 'local')  # 'local' or 'proxy' (trust X-RateLimit-Remaining)
+    RATE_LIMIT_STORAGE_URL = os.environ.get('RATE_LIMIT_STORAGE_URL', '')  # e.g. redis://localhost:6379/0
+    CONCURRENT_REQUEST_LIMIT = int(os.environ.get('CONCURRENT_REQUEST_LIMIT', 0))  # per IP, 0 disables (Redis only)
+    CONCURRENT_REQUEST_TTL = int(os.environ.get('CONCURRENT_REQUEST_TTL', 60))  # seconds before a slot is considered leaked
     
     @staticmethod
     def init_app(app):
@@ -98,7 +116,8 @@ config = {
     'default': DevelopmentConfig
 }
 
+@lru_cache(maxsize=None)
 def get_config():
-    """Get configuration based on environment."""
+    """Get configuration based on environment (resolved once per process)."""
     config_name = os.environ.get('FLASK_ENV', 'default')
     return config.get(config_name, config['default'])
@@ -0,0 +1,47 @@
+"""
+Gunicorn configuration for HTE App.
+The app is built once in the master and handed to the worker copy-on-write.
+
+Experiment state and the session store live in process memory (state/experiment.py),
+so a single worker serves every request, with GUNICORN_THREADS threads. Running
+more workers needs a shared experiment store first; until then it is refused.
+
+Usage: gunicorn -c gunicorn_conf.py app:app
+"""
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('GUNICORN_WORKERS', 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+preload_app = True
+
+if workers != 1:
+    raise RuntimeError('GUNICORN_WORKERS must be 1: experiment state is held in process memory')
+
+def when_ready(server):
+    """Finish initialization in the master before any worker is forked."""
+    from app import create_app, load_blueprints
+    from state import wait_for_inventory
+    
+    # Same (memoized) app as app:app, also when GUNICORN_PRELOAD=skip
+    app = create_app()
+    
+    # Import route modules and compile the URL map once, before forking
+    load_blueprints(app)
+    
+    # Threads do not survive fork, so the inventory must be loaded by now
+    wait_for_inventory()
+    
+    # Flush buffered records so each worker doesn't write its own copy
+    log_buffer = app.extensions.get('log_buffer')
+    if log_buffer is not None:
+        log_buffer.flush()
+
+def post_fork(server, worker):
+    """Restart per-process threads that were lost in the fork."""
+    from app import create_app, start_log_flusher
+    
+    app = create_app()
+    log_buffer = app.extensions.get('log_buffer')
+    if log_buffer is not None:
+        start_log_flusher(log_buffer, app.config['LOG_FLUSH_INTERVAL'])
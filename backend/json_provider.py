@@ -0,0 +1,72 @@
+"""
+JSON provider for HTE App.
+Serializes responses and parses request bodies with orjson when it is installed.
+"""
+from flask import current_app, jsonify
+from flask.json.provider import DefaultJSONProvider, _default
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+if ORJSON_AVAILABLE:
+    # datetime/date go through Flask's _default (HTTP dates) like pd.Timestamp,
+    # instead of orjson's native ISO format
+    BASE_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_PASSTHROUGH_DATETIME
+
+class OrjsonProvider(DefaultJSONProvider):
+    """orjson-backed provider; falls back to Flask's encoder for unknown types."""
+    
+    def _options(self, indent=False):
+        option = BASE_OPTIONS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return option
+    
+    def dumps(self, obj, **kwargs):
+        """Serialize obj to a JSON string."""
+        return orjson.dumps(obj, default=_default, option=self._options('indent' in kwargs)).decode()
+    
+    def loads(self, s, **kwargs):
+        """Parse a JSON string or bytes."""
+        return orjson.loads(s)
+    
+    def response(self, *args, **kwargs):
+        """Build a JSON response from bytes without the intermediate str."""
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        body = orjson.dumps(
+            obj,
+            default=_default,
+            option=self._options(indent) | orjson.OPT_APPEND_NEWLINE
+        )
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+def dump_records(payload):
+    """
+    Serialize a large list-of-records payload to compact JSON bytes.
+    
+    Skips key sorting and debug-mode indentation, which dominate the cost of
+    multi-thousand-row inventory responses. Falls back to the app's provider.
+    """
+    if not ORJSON_AVAILABLE:
+        return (current_app.json.dumps(payload) + '\n').encode()
+    return orjson.dumps(
+        payload,
+        default=_default,
+        option=BASE_OPTIONS | orjson.OPT_APPEND_NEWLINE
+    )
+
+def json_bytes_response(body):
+    """JSON response from already-serialized bytes, e.g. a cached dump_records() result."""
+    return current_app.response_class(body, mimetype='application/json')
+
+def jsonify_records(payload):
+    """jsonify() for large list-of-records payloads; see dump_records()."""
+    if not ORJSON_AVAILABLE:
+        return jsonify(payload)
+    return json_bytes_response(dump_records(payload))
@@ -3,6 +3,7 @@ Experiment routes blueprint.
 Handles experiment context, materials, procedure, and results operations.
 """
 from flask import Blueprint, request, jsonify
+from json_provider import jsonify_records
 from state import current_experiment
 from validation import (
     validate_request, validate_response,
@@ -18,6 +19,9 @@ experiment_bp = Blueprint('experiment', __name__, url_prefix='/api/experiment')
 def experiment_context():
     """Get or update experiment context"""
     if request.method == 'POST':
+        # Parse the body once; malformed JSON is rejected with a 400 here
+        data = request.get_json()
+        
         # Optional validation in warn-only mode
         try:
             from validation.utils import validate_data
@@ -25,7 +29,7 @@ def experiment_context():
             
             schema = ExperimentContextSchema()
             validated_data, errors = validate_data(
-                schema, request.json, strict_mode=False, 
+                schema, data, strict_mode=False, 
                 endpoint="POST /api/experiment/context"
             )
             current_experiment['context'] = validated_data
@@ -33,7 +37,7 @@ def experiment_context():
             # If validation fails, use original data and log warning
             import logging
             logging.warning(f"Context validation failed: {e}")
-            current_experiment['context'] = request.json
+            current_experiment['context'] = data
             
         return jsonify({'message': 'Context updated'})
     
@@ -97,13 +101,15 @@ def experiment_context():
 def experiment_materials():
     """Get or update experiment materials"""
     if request.method == 'POST':
+        # Parse the body once; malformed JSON is rejected with a 400 here
+        materials_data = request.get_json()
+        
         # Optional validation in warn-only mode
         try:
             from validation.utils import validate_data
             from validation.schemas import MaterialSchema
             
             # Validate each material in the list
-            materials_data = request.json
             if isinstance(materials_data, list):
                 validated_materials = []
                 schema = MaterialSchema()
@@ -120,19 +126,40 @@ def experiment_materials():
             # If validation fails, use original data and log warning
             import logging
             logging.warning(f"Materials validation failed: {e}")
-            current_experiment['materials'] = request.json
+            current_experiment['materials'] = materials_data
             
         return jsonify({'message': 'Materials updated'})
     
     return jsonify(current_experiment['materials'])
 
-@experiment_bp.route('/procedure', methods=['GET', 'POST'])
+@experiment_bp.route('/procedure', methods=['GET', 'POST', 'PATCH'])
 def experiment_procedure():
-    """Get or update experiment procedure (96-well plate)"""
+    """Get, replace (POST) or partially update (PATCH) experiment procedure (96-well plate)"""
     if request.method == 'POST':
         current_experiment['procedure'] = request.json
         return jsonify({'message': 'Procedure updated'})
     
+    if request.method == 'PATCH':
+        # Only the changed wells are sent; each replaces the entry for its
+        # well, and wells not yet in the procedure are appended
+        wells = request.get_json()
+        if not isinstance(wells, list) or not all(isinstance(well, dict) and well.get('well') for well in wells):
+            return jsonify({'error': 'Expected a list of well entries, each with a "well" name'}), 400
+        
+        # Hold the experiment lock across the read-modify-write
+        with current_experiment.lock:
+            procedure = list(current_experiment.get('procedure') or [])
+            index_by_well = {entry.get('well'): i for i, entry in enumerate(procedure)}
+            for well in wells:
+                i = index_by_well.get(well['well'])
+                if i is None:
+                    index_by_well[well['well']] = len(procedure)
+                    procedure.append(well)
+                else:
+                    procedure[i] = well
+            current_experiment['procedure'] = procedure
+        return jsonify({'message': 'Procedure updated', 'updated_wells': len(wells)})
+    
     return jsonify(current_experiment['procedure'])
 
 @experiment_bp.route('/procedure-settings', methods=['GET', 'POST'])
@@ -163,28 +190,33 @@ def experiment_analytical():
     """Get or update analytical data"""
     try:
         if request.method == 'POST':
+            data = request.get_json()
+            
             # Handle selected compounds update
-            if 'selectedCompounds' in request.json:
-                if 'analytical_data' not in current_experiment:
-                    current_experiment['analytical_data'] = {}
-                current_experiment['analytical_data']['selectedCompounds'] = request.json['selectedCompounds']
+            if 'selectedCompounds' in data:
+                # Hold the experiment lock across the read-modify-write
+                with current_experiment.lock:
+                    if 'analytical_data' not in current_experiment:
+                        current_experiment['analytical_data'] = {}
+                    current_experiment['analytical_data']['selectedCompounds'] = data['selectedCompounds']
                 return jsonify({'message': 'Selected compounds updated'})
             else:
                 # Handle other analytical data updates
-                current_experiment['analytical_data'] = request.json
+                current_experiment['analytical_data'] = data
                 return jsonify({'message': 'Analytical data updated'})
         
-        # Return the analytical data structure that frontend expects
+        # Return the analytical data structure that frontend expects. Uploaded files
+        # hold one dict per sheet row, so skip jsonify's per-dict key sorting
         analytical_data = current_experiment.get('analytical_data', {})
         if isinstance(analytical_data, list):
             # If it's a list (old format), convert to new format
-            return jsonify({
+            return jsonify_records({
                 'selectedCompounds': [],
                 'uploadedFiles': analytical_data
             })
         else:
             # Return the analytical data as is
-            return jsonify(analytical_data)
+            return jsonify_records(analytical_data)
     except Exception as e:
         print(f"Error in experiment_analytical: {str(e)}")
         import traceback
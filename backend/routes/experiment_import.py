@@ -2,8 +2,6 @@
 Import routes blueprint.
 Handles experiment data import from Excel format.
 """
-import os
-import tempfile
 from datetime import datetime
 from flask import Blueprint, request, jsonify
 from openpyxl import load_workbook
@@ -40,14 +38,11 @@ def import_experiment():
         if file_size > 10 * 1024 * 1024:  # 10MB limit
             return jsonify({'error': 'File size exceeds 10MB limit'}), 400
         
-        # Save uploaded file temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as tmp:
-            file.save(tmp.name)
-            tmp_path = tmp.name
+        # Load the workbook straight from the upload stream instead of writing
+        # it to a temporary file and reading it back
+        wb = load_workbook(file.stream, data_only=True)
         
         try:
-            # Load the workbook
-            wb = load_workbook(tmp_path, data_only=True)
             
             # Initialize import results
             import_results = {
@@ -154,21 +149,23 @@ def import_experiment():
                         import_results['analytical_data']['data'] = analytical_data
                         
                         # Store analytical data in the expected format (same as upload)
-                        if 'analytical_data' not in current_experiment:
-                            current_experiment['analytical_data'] = {}
-                        
-                        # If analytical_data is a list (old format), convert it to new format
-                        if isinstance(current_experiment['analytical_data'], list):
-                            old_uploads = current_experiment['analytical_data']
-                            current_experiment['analytical_data'] = {
-                                'selectedCompounds': [],
-                                'uploadedFiles': old_uploads
-                            }
-                        
-                        if 'uploadedFiles' not in current_experiment['analytical_data']:
-                            current_experiment['analytical_data']['uploadedFiles'] = []
-                        
-                        current_experiment['analytical_data']['uploadedFiles'].append(analytical_data)
+                        # Hold the experiment lock across the read-modify-write
+                        with current_experiment.lock:
+                            if 'analytical_data' not in current_experiment:
+                                current_experiment['analytical_data'] = {}
+                            
+                            # If analytical_data is a list (old format), convert it to new format
+                            if isinstance(current_experiment['analytical_data'], list):
+                                old_uploads = current_experiment['analytical_data']
+                                current_experiment['analytical_data'] = {
+                                    'selectedCompounds': [],
+                                    'uploadedFiles': old_uploads
+                                }
+                            
+                            if 'uploadedFiles' not in current_experiment['analytical_data']:
+                                current_experiment['analytical_data']['uploadedFiles'] = []
+                            
+                            current_experiment['analytical_data']['uploadedFiles'].append(analytical_data)
                 except Exception as e:
                     import_results['errors'].append(f"Analytical data import error: {str(e)}")
             
@@ -225,9 +222,7 @@ def import_experiment():
             })
             
         finally:
-            # Clean up temporary file
-            if os.path.exists(tmp_path):
-                os.unlink(tmp_path)
+            wb.close()
                 
     except Exception as e:
         return jsonify({'error': f'Import failed: {str(e)}'}), 500
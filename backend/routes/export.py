@@ -2,25 +2,45 @@
 Export routes blueprint.
 Handles experiment data export to Excel format.
 """
+import io
 import os
-import tempfile
+from collections import defaultdict
 from datetime import datetime
 from flask import Blueprint, request, jsonify, send_file
 from openpyxl import Workbook
-from state import current_experiment, inventory_data
+from state import current_experiment, wait_for_inventory
+from state.inventory import get_inventory_enrichment_index
+from utils import ALL_WELL_NAMES, ALL_WELL_NAME_SET, get_plate_wells
 
 # Create blueprint
 export_bp = Blueprint('export', __name__, url_prefix='/api/experiment')
 
+# Procedure sheet columns: up to 15 compounds, 5 reagents and 3 solvents,
+# as a name and an amount column each. Built once rather than per export and per well.
+PROCEDURE_AMOUNT_COLUMNS = (
+    [('Compound', 'compound', i, 'mmol', 'mmol') for i in range(1, 16)] +
+    [('Reagent', 'reagent', i, 'mmol', 'mmol') for i in range(1, 6)] +
+    [('Solvent', 'solvent', i, 'uL', 'ul') for i in range(1, 4)]
+)
+PROCEDURE_HEADERS = ['Well', 'Sample ID'] + [
+    header
+    for label, _, i, unit, _ in PROCEDURE_AMOUNT_COLUMNS
+    for header in (f'{label}-{i}_name', f'{label}-{i}_{unit}')
+]
+# Procedure well keys holding each column's value, in column order
+PROCEDURE_KEYS = tuple(
+    key
+    for _, prefix, i, _, amount in PROCEDURE_AMOUNT_COLUMNS
+    for key in (f'{prefix}_{i}_name', f'{prefix}_{i}_{amount}')
+)
+
 @export_bp.route('/export', methods=['POST'])
 def export_experiment():
     """Export experiment data to Excel format"""
-    # Create a new workbook
-    wb = Workbook()
-    
-    # Remove default sheet
-    if wb.active:
-        wb.remove(wb.active)
+    # Create a new workbook; rows are only ever appended, so a write-only
+    # workbook streams them to disk instead of building every cell in memory.
+    # It starts without a default sheet.
+    wb = Workbook(write_only=True)
     
     # Context sheet
     ws_context = wb.create_sheet("Context")
@@ -42,21 +62,10 @@ def export_experiment():
         headers = ['Nr', 'chemical_name', 'alias', 'cas_number', 'molecular_weight', 'smiles', 'barcode', 'role', 'source', 'supplier']
         ws_materials.append(headers)
         
-        # Load inventory data to enrich materials
-        inventory_enrichment = {}
-        if inventory_data:
-            for _, inv_item in inventory_data.iterrows():
-                # Create lookup keys for matching
-                name_key = str(inv_item.get('chemical_name', '')).lower()
-                cas_key = str(inv_item.get('cas_number', '')).lower()
-                alias_key = str(inv_item.get('alias', '')).lower()
-                
-                # Store inventory data for matching
-                inventory_enrichment[name_key] = inv_item.to_dict()
-                if cas_key and cas_key != 'nan':
-                    inventory_enrichment[cas_key] = inv_item.to_dict()
-                if alias_key and alias_key != 'nan':
-                    inventory_enrichment[alias_key] = inv_item.to_dict()
+        # Inventory rows by lowercase name, CAS number and alias, to enrich materials;
+        # the index is kept between exports until the inventory is reloaded
+        wait_for_inventory()
+        inventory_df, inventory_enrichment = get_inventory_enrichment_index()
         
         # Add materials with enriched data from inventory
         for i, material in enumerate(current_experiment['materials'], 1):
@@ -66,13 +75,15 @@ def export_experiment():
             material_cas = str(material.get('cas', '')).lower()
             material_alias = str(material.get('alias', '')).lower()
             
-            # Look for matches in inventory
-            if material_name in inventory_enrichment:
-                enriched_data = inventory_enrichment[material_name]
-            elif material_cas in inventory_enrichment and material_cas != 'nan':
-                enriched_data = inventory_enrichment[material_cas]
-            elif material_alias in inventory_enrichment and material_alias != 'nan':
-                enriched_data = inventory_enrichment[material_alias]
+            # Look for matches in inventory: by name, then CAS number, then alias
+            # (one probe each; row position 0 is valid, so test for None)
+            position = inventory_enrichment.get(material_name)
+            if position is None and material_cas != 'nan':
+                position = inventory_enrichment.get(material_cas)
+            if position is None and material_alias != 'nan':
+                position = inventory_enrichment.get(material_alias)
+            if position is not None:
+                enriched_data = inventory_df.iloc[position].to_dict()
             
             # Use material data first, then enrich with inventory data
             row = [
@@ -93,43 +104,13 @@ def export_experiment():
     ws_procedure = wb.create_sheet("Procedure")
     if current_experiment.get('procedure'):
         # Add headers for 96-well plate
-        headers = ['Well', 'Sample ID']
-        # Add compound columns (up to 15 compounds)
-        for i in range(1, 16):
-            headers.extend([f'Compound-{i}_name', f'Compound-{i}_mmol'])
-        # Add reagent columns (up to 5 reagents)
-        for i in range(1, 6):
-            headers.extend([f'Reagent-{i}_name', f'Reagent-{i}_mmol'])
-        # Add solvent columns (up to 3 solvents)
-        for i in range(1, 4):
-            headers.extend([f'Solvent-{i}_name', f'Solvent-{i}_uL'])
-        
-        ws_procedure.append(headers)
+        ws_procedure.append(PROCEDURE_HEADERS)
         
-        # Add procedure data
+        # Add procedure data: compounds, reagents and solvents
         for i, well_data in enumerate(current_experiment['procedure'], 1):
-            row = [i, well_data.get('well', ''), well_data.get('id', '')]
-            
-            # Add compounds
-            for j in range(1, 16):
-                row.extend([
-                    well_data.get(f'compound_{j}_name', ''),
-                    well_data.get(f'compound_{j}_mmol', '')
-                ])
-            
-            # Add reagents
-            for j in range(1, 6):
-                row.extend([
-                    well_data.get(f'reagent_{j}_name', ''),
-                    well_data.get(f'reagent_{j}_mmol', '')
-                ])
-            
-            # Add solvents
-            for j in range(1, 4):
-                row.extend([
-                    well_data.get(f'solvent_{j}_name', ''),
-                    well_data.get(f'solvent_{j}_ul', '')
-                ])
+            get = well_data.get
+            row = [i, get('well', ''), get('id', '')]
+            row += [get(key, '') for key in PROCEDURE_KEYS]
             
             ws_procedure.append(row)
     
@@ -182,40 +163,15 @@ def export_experiment():
     # Get plate type from context to generate appropriate number of wells
     plate_type = current_experiment.get('context', {}).get('plate_type', '96')
     
-    def get_plate_config(plate_type):
-        if plate_type == "24":
-            return {
-                'rows': ['A', 'B', 'C', 'D'],
-                'columns': list(range(1, 7))  # 1-6
-            }
-        elif plate_type == "48":
-            return {
-                'rows': ['A', 'B', 'C', 'D', 'E', 'F'],
-                'columns': list(range(1, 9))  # 1-8
-            }
-        else:  # Default to 96-well
-            return {
-                'rows': ['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H'],
-                'columns': list(range(1, 13))  # 1-12
-            }
-    
-    plate_config = get_plate_config(plate_type)
-    
-    # Generate wells based on plate type
-    for col in plate_config['rows']:
-        for row in plate_config['columns']:
-            well = f'{col}{row}'
-            well_id = f'{eln_number}_{well}'
-            
-            # Create row with Well, Sample ID
-            row_data = [well, well_id]
-            
-            # Add compound name and area placeholders
-            for i, compound in enumerate(selected_compounds, 1):
-                compound_name = compound.get('name', f'Compound_{i}')
-                row_data.extend([compound_name, ''])  # Empty area for template
-            
-            ws_analytical.append(row_data)
+    # Compound name and empty area placeholders are the same for every well
+    compound_cells = []
+    for i, compound in enumerate(selected_compounds, 1):
+        compound_cells.extend([compound.get('name', f'Compound_{i}'), ''])
+    
+    # Generate wells based on plate type (unknown types use the 96-well plate)
+    for well in get_plate_wells(plate_type):
+        # Create row with Well, Sample ID, then the compound placeholders
+        ws_analytical.append([well, f'{eln_number}_{well}', *compound_cells])
     
     # Results sheet
     ws_results = wb.create_sheet("Results (1)")
@@ -244,22 +200,18 @@ def export_experiment():
     for material in current_experiment.get('materials', []):
         materials_map[material.get('name', '').lower()] = material
     
-    # Initialize well contents data
-    well_contents = {}
-    for col in ['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H']:
-        for row in range(1, 13):
-            well = f'{col}{row}'
-            well_contents[well] = {
-                'compounds': [],
-                'reagents': [],
-                'solvents': []
-            }
-    
-    # Fill in well contents from procedure data
+    # Well contents data, created only for wells that appear in the procedure
+    well_contents = defaultdict(lambda: {
+        'compounds': [],
+        'reagents': [],
+        'solvents': []
+    })
+    
+    # Fill in well contents from procedure data (wells of a 96-well plate)
     if current_experiment.get('procedure'):
         for well_data in current_experiment['procedure']:
             well = well_data.get('well', '')
-            if well in well_contents:
+            if well in ALL_WELL_NAME_SET:
                 # Process materials array
                 materials = well_data.get('materials', [])
                 
@@ -281,10 +233,10 @@ def export_experiment():
     
     # Find the maximum number of compounds across all wells to determine column count
     max_compounds = 0
-    for well in well_contents:
-        compounds_count = len(well_contents[well]['compounds'])
-        reagents_count = len(well_contents[well]['reagents'])
-        solvents_count = len(well_contents[well]['solvents'])
+    for contents in well_contents.values():
+        compounds_count = len(contents['compounds'])
+        reagents_count = len(contents['reagents'])
+        solvents_count = len(contents['solvents'])
         total_materials = compounds_count + reagents_count + solvents_count
         max_compounds = max(max_compounds, total_materials)
     
@@ -295,66 +247,62 @@ def export_experiment():
     
     ws_well_contents.append(headers)
     
-    # Add data for each well (all 96 wells)
-    for col in ['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H']:
-        for row in range(1, 13):
-            well = f'{col}{row}'
-            contents = well_contents[well]
-            
-            # Combine all materials into a single list
-            all_materials = []
-            all_materials.extend(contents['compounds'])
-            all_materials.extend(contents['reagents'])
-            all_materials.extend(contents['solvents'])
-            
-            # Create row data
-            row_data = [well]
-            
-            # Add materials to columns (4 columns per material)
-            for i in range(max_compounds):
-                if i < len(all_materials):
-                    material = all_materials[i]
-                    row_data.extend([
-                        material.get('name', ''),
-                        material.get('alias', ''),
-                        material.get('cas', ''),
-                        material.get('amount', '')
-                    ])
-                else:
-                    # Fill empty columns
-                    row_data.extend(['', '', '', ''])
-            
-            ws_well_contents.append(row_data)
+    # Add data for each well (all 96 wells); wells without contents get empty columns
+    empty_row_cells = [''] * (4 * max_compounds)
+    for well in ALL_WELL_NAMES:
+        contents = well_contents.get(well)
+        if contents is None:
+            ws_well_contents.append([well] + empty_row_cells)
+            continue
+        
+        # Combine all materials into a single list
+        all_materials = contents['compounds'] + contents['reagents'] + contents['solvents']
+        
+        # Add materials to columns (4 columns per material), then fill the
+        # columns this well does not use; max_compounds covers every well
+        row_data = [
+            well,
+            *(value
+              for material in all_materials
+              for value in (material.get('name', ''), material.get('alias', ''),
+                            material.get('cas', ''), material.get('amount', ''))),
+            *empty_row_cells[4 * len(all_materials):]
+        ]
+        
+        ws_well_contents.append(row_data)
     
     # Procedure Settings sheet
     ws_procedure_settings = wb.create_sheet("Procedure Settings")
+    procedure_settings = current_experiment.get('procedure_settings', {})
+    reaction_conditions = procedure_settings.get('reactionConditions', {})
+    analytical_details = procedure_settings.get('analyticalDetails', {})
     
     # Reaction Conditions section
     ws_procedure_settings.append(['Reaction Conditions'])
     ws_procedure_settings.append(['Parameter', 'Value', 'Unit'])
-    ws_procedure_settings.append(['Temperature', current_experiment.get('procedure_settings', {}).get('reactionConditions', {}).get('temperature', ''), 'degC'])
-    ws_procedure_settings.append(['Time', current_experiment.get('procedure_settings', {}).get('reactionConditions', {}).get('time', ''), 'h'])
-    ws_procedure_settings.append(['Pressure', current_experiment.get('procedure_settings', {}).get('reactionConditions', {}).get('pressure', ''), 'bar'])
-    ws_procedure_settings.append(['Wavelength', current_experiment.get('procedure_settings', {}).get('reactionConditions', {}).get('wavelength', ''), 'nm'])
+    ws_procedure_settings.append(['Temperature', reaction_conditions.get('temperature', ''), 'degC'])
+    ws_procedure_settings.append(['Time', reaction_conditions.get('time', ''), 'h'])
+    ws_procedure_settings.append(['Pressure', reaction_conditions.get('pressure', ''), 'bar'])
+    ws_procedure_settings.append(['Wavelength', reaction_conditions.get('wavelength', ''), 'nm'])
     ws_procedure_settings.append([''])  # Empty row for spacing
     ws_procedure_settings.append(['Remarks'])
-    ws_procedure_settings.append([current_experiment.get('procedure_settings', {}).get('reactionConditions', {}).get('remarks', '')])
+    ws_procedure_settings.append([reaction_conditions.get('remarks', '')])
     
     # Analytical Details section
     ws_procedure_settings.append([''])  # Empty row for spacing
     ws_procedure_settings.append(['Analytical Details'])
     ws_procedure_settings.append(['Parameter', 'Value', 'Unit'])
-    ws_procedure_settings.append(['UPLC #', current_experiment.get('procedure_settings', {}).get('analyticalDetails', {}).get('uplcNumber', ''), ''])
-    ws_procedure_settings.append(['Method', current_experiment.get('procedure_settings', {}).get('analyticalDetails', {}).get('method', ''), ''])
-    ws_procedure_settings.append(['Duration', current_experiment.get('procedure_settings', {}).get('analyticalDetails', {}).get('duration', ''), 'min'])
+    ws_procedure_settings.append(['UPLC #', analytical_details.get('uplcNumber', ''), ''])
+    ws_procedure_settings.append(['Method', analytical_details.get('method', ''), ''])
+    ws_procedure_settings.append(['Duration', analytical_details.get('duration', ''), 'min'])
     ws_procedure_settings.append([''])  # Empty row for spacing
     ws_procedure_settings.append(['Remarks'])
-    ws_procedure_settings.append([current_experiment.get('procedure_settings', {}).get('analyticalDetails', {}).get('remarks', '')])
+    ws_procedure_settings.append([analytical_details.get('remarks', '')])
     
-    # Save to temporary file
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as tmp:
-        wb.save(tmp.name)
-        tmp_path = tmp.name
+    # Save straight into memory; a temporary file would be left behind on disk
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    buffer.seek(0)
     
     # Generate filename based on ELN number or timestamp
     context = current_experiment.get('context', {})
@@ -368,17 +316,19 @@ def export_experiment():
         # Fallback to original timestamp format
         filename = f'HTE_experiment_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
     
-    return send_file(tmp_path, as_attachment=True, download_name=filename)
+    return send_file(
+        buffer,
+        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        as_attachment=True,
+        download_name=filename
+    )
 
 @export_bp.route('/analytical-template', methods=['POST'])
 def export_analytical_template():
     """Export analytical data template in the exact format matching the provided template"""
-    # Create a new workbook for analytical template only
-    wb = Workbook()
-    
-    # Remove default sheet
-    if wb.active:
-        wb.remove(wb.active)
+    # Create a new workbook for analytical template only; rows are only
+    # appended, so it is written in write-only mode (no default sheet to remove)
+    wb = Workbook(write_only=True)
     
     # Create analytical data sheet
     ws = wb.create_sheet("Analytical Template")
@@ -425,46 +375,20 @@ def export_analytical_template():
     # Get plate type from context to generate appropriate number of wells
     plate_type = current_experiment.get('context', {}).get('plate_type', '96')
     
-    # Use the same plate config function
-    def get_plate_config(plate_type):
-        if plate_type == "24":
-            return {
-                'rows': ['A', 'B', 'C', 'D'],
-                'columns': list(range(1, 7))  # 1-6
-            }
-        elif plate_type == "48":
-            return {
-                'rows': ['A', 'B', 'C', 'D', 'E', 'F'],
-                'columns': list(range(1, 9))  # 1-8
-            }
-        else:  # Default to 96-well
-            return {
-                'rows': ['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H'],
-                'columns': list(range(1, 13))  # 1-12
-            }
-    
-    plate_config = get_plate_config(plate_type)
-    
-    # Generate wells based on plate type
-    for col in plate_config['rows']:
-        for row in plate_config['columns']:
-            well = f'{col}{row}'
-            well_id = f'{eln_number}_{well}'
-            
-            # Create row with Well, Sample ID
-            row_data = [well, well_id]
-            
-            # Add compound name and empty area placeholders for template
-            for i, compound in enumerate(selected_compounds, 1):
-                compound_name = compound.get('name', f'Compound_{i}')
-                row_data.extend([compound_name, ''])  # Empty area for template
-            
-            ws.append(row_data)
+    # Compound name and empty area placeholders are the same for every well
+    compound_cells = []
+    for i, compound in enumerate(selected_compounds, 1):
+        compound_cells.extend([compound.get('name', f'Compound_{i}'), ''])
+    
+    # Generate wells based on plate type (unknown types use the 96-well plate)
+    for well in get_plate_wells(plate_type):
+        # Create row with Well, Sample ID, then the compound placeholders
+        ws.append([well, f'{eln_number}_{well}', *compound_cells])
     
-    # Save to temporary file
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as tmp:
-        wb.save(tmp.name)
-        tmp_path = tmp.name
+    # Save straight into memory; a temporary file would be left behind on disk
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    buffer.seek(0)
     
     # Generate filename
     context = current_experiment.get('context', {})
@@ -475,4 +399,9 @@ def export_analytical_template():
     else:
         filename = f'Analytical_Template_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
     
-    return send_file(tmp_path, as_attachment=True, download_name=filename)
+    return send_file(
+        buffer,
+        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        as_attachment=True,
+        download_name=filename
+    )
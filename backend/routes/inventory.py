@@ -5,7 +5,12 @@ Handles inventory and private inventory operations.
 import os
 import pandas as pd
 from flask import Blueprint, request, jsonify
-from state import inventory_data, load_inventory
+from json_provider import json_bytes_response, jsonify_records
+from state import inventory_data, load_inventory, wait_for_inventory, read_excel_cached, invalidate_excel_cache
+from state.inventory import (
+    drop_search_columns, get_inventory_json, get_inventory_json_gzip, prepare_inventory_frame, search_blob_mask
+)
+from utils import frame_to_records
 
 # Create blueprint
 inventory_bp = Blueprint('inventory', __name__, url_prefix='/api/inventory')
@@ -13,6 +18,7 @@ inventory_bp = Blueprint('inventory', __name__, url_prefix='/api/inventory')
 @inventory_bp.route('', methods=['GET'])
 def get_inventory():
     """Get all chemicals from inventory with optional pagination"""
+    wait_for_inventory()
     if not inventory_data:
         if not load_inventory():
             return jsonify({'error': 'Failed to load inventory'}), 500
@@ -23,28 +29,20 @@ def get_inventory():
         limit = request.args.get('limit', type=int)
         fields = request.args.get('fields', '').split(',') if request.args.get('fields') else None
         
-        # Clean the data before JSON serialization
-        records = inventory_data.to_dict('records')
-        cleaned_records = []
+        # The full inventory is serialized (and gzipped) once per load and served from cache
+        if not (fields and fields[0]) and (page is None or limit is None):
+            from compression import accepts_gzip, gzipped_response
+            if accepts_gzip():
+                return gzipped_response(json_bytes_response(get_inventory_json_gzip()))
+            return json_bytes_response(get_inventory_json())
         
-        for record in records:
-            cleaned_record = {}
-            for key, value in record.items():
-                if pd.isna(value) or (hasattr(value, 'year') and pd.isna(value)):
-                    cleaned_record[key] = None
-                elif hasattr(value, 'isoformat'):
-                    cleaned_record[key] = value.isoformat()
-                else:
-                    cleaned_record[key] = value
-            cleaned_records.append(cleaned_record)
+        # Values are already str or None (normalized at load)
+        inventory_df = drop_search_columns(inventory_data)
         
-        # Apply field filtering if requested
+        # Apply field filtering if requested, before building the records
         if fields and fields[0]:  # Check if fields is not empty
-            filtered_records = []
-            for record in cleaned_records:
-                filtered_record = {field: record.get(field) for field in fields if field in record}
-                filtered_records.append(filtered_record)
-            cleaned_records = filtered_records
+            inventory_df = inventory_df[[field for field in dict.fromkeys(fields) if field in inventory_df.columns]]
+        cleaned_records = frame_to_records(inventory_df)
         
         # Apply pagination if requested
         if page is not None and limit is not None:
@@ -53,7 +51,7 @@ def get_inventory():
             end = start + limit
             paginated_records = cleaned_records[start:end]
             
-            return jsonify({
+            return jsonify_records({
                 'data': paginated_records,
                 'pagination': {
                     'page': page,
@@ -66,7 +64,7 @@ def get_inventory():
             })
         
         # Return all data (backward compatible)
-        return jsonify(cleaned_records)
+        return jsonify_records(cleaned_records)
     else:
         return jsonify([])
 
@@ -76,53 +74,39 @@ def search_inventory():
     query = request.args.get('q', '').lower()
     
     # Main inventory
+    wait_for_inventory()
     if not inventory_data:
         if not load_inventory():
             return jsonify({'error': 'Failed to load inventory'}), 500
     
     main_results = pd.DataFrame()
     if inventory_data:
-        main_results = inventory_data[
-            inventory_data['chemical_name'].str.lower().str.contains(query, na=False) |
-            inventory_data['alias'].str.lower().str.contains(query, na=False) |
-            inventory_data['cas_number'].astype(str).str.lower().str.contains(query, na=False) |
-            inventory_data['smiles'].astype(str).str.lower().str.contains(query, na=False)
-        ]
+        main_results = inventory_data[search_blob_mask(inventory_data, query)]
     
     # Private inventory
     private_path = os.path.join(os.path.dirname(__file__), '..', '..', 'Private_Inventory.xlsx')
     private_results = pd.DataFrame()
     if os.path.exists(private_path):
         try:
-            # Read private inventory without parsing dates to avoid NaTType issues
-            private_df = pd.read_excel(private_path, parse_dates=False)
+            # Read private inventory without parsing dates; cells are normalized once per file version
+            private_df = read_excel_cached(private_path, prepare=prepare_inventory_frame, parse_dates=False)
             
-            # Convert all columns to string to avoid any datetime/NaT issues
-            for col in private_df.columns:
-                private_df[col] = private_df[col].astype(str)
-                # Replace 'nan' strings with None for better JSON handling
-                private_df[col] = private_df[col].replace('nan', None)
-            
-            private_results = private_df[
-                private_df['chemical_name'].str.lower().str.contains(query, na=False) |
-                private_df['alias'].str.lower().str.contains(query, na=False) |
-                private_df['cas_number'].astype(str).str.lower().str.contains(query, na=False) |
-                private_df['smiles'].astype(str).str.lower().str.contains(query, na=False)
-            ]
+            private_results = private_df[search_blob_mask(private_df, query)]
         except Exception as e:
             print(f"Error loading private inventory: {e}")
             pass
     
     # Combine with main inventory priority
     if not main_results.empty and not private_results.empty:
-        # Get names and CAS from main results to filter out duplicates from private
-        main_names = set(main_results['chemical_name'].str.lower())
-        main_cas = set(main_results['cas_number'].astype(str).str.lower())
+        # Get names and CAS from main results to filter out duplicates from private;
+        # blanks (including sheets without the column) never count as a match
+        main_names = set(main_results['_lc_chemical_name']) - {''}
+        main_cas = set(main_results['_lc_cas_number']) - {''}
         
         # Filter private results to exclude duplicates
         private_filtered = private_results[
-            ~(private_results['chemical_name'].str.lower().isin(main_names) |
-              private_results['cas_number'].astype(str).str.lower().isin(main_cas))
+            ~(private_results['_lc_chemical_name'].isin(main_names) |
+              private_results['_lc_cas_number'].isin(main_cas))
         ]
         
         # Combine main results with filtered private results
@@ -134,25 +118,10 @@ def search_inventory():
     else:
         combined = pd.DataFrame()
     
-    # Clean the data before JSON serialization to handle NaT values
+    # Columns missing from one of the sources come back as NaN after concat
     if not combined.empty:
-        # Convert DataFrame to records and clean any problematic values
-        records = combined.to_dict('records')
-        cleaned_records = []
-        
-        for record in records:
-            cleaned_record = {}
-            for key, value in record.items():
-                # Handle pandas NaT values and other problematic types
-                if pd.isna(value) or (hasattr(value, 'year') and pd.isna(value)):
-                    cleaned_record[key] = None
-                elif hasattr(value, 'isoformat'):  # datetime objects
-                    cleaned_record[key] = value.isoformat()
-                else:
-                    cleaned_record[key] = value
-            cleaned_records.append(cleaned_record)
-        
-        return jsonify(cleaned_records)
+        combined = drop_search_columns(combined)
+        return jsonify_records(frame_to_records(combined.astype(object).where(combined.notna(), None)))
     else:
         return jsonify([])
 
@@ -174,7 +143,8 @@ def add_to_private_inventory():
         wb.save(private_path)
 
     # Load and check for duplicates
-    df = pd.read_excel(private_path)
+    df = read_excel_cached(private_path)
+    can_append = list(df.columns) == headers
     
     # Ensure the DataFrame has only the correct columns
     required_columns = ['chemical_name', 'alias', 'cas_number', 'molecular_weight', 'smiles', 'barcode']
@@ -198,8 +168,17 @@ def add_to_private_inventory():
         'smiles': chemical.get('smiles', ''),
         'barcode': chemical.get('barcode', '')
     }
-    df = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
-    df.to_excel(private_path, index=False)
+    if can_append:
+        # Header already matches: append the row instead of re-serializing the sheet
+        from openpyxl import load_workbook
+        wb = load_workbook(private_path)
+        wb.worksheets[0].append([new_row[col] for col in headers])
+        wb.save(private_path)
+    else:
+        # Rewrite the whole file so its structure is normalized to the required columns
+        df.loc[len(df)] = [new_row[col] for col in headers]
+        df.to_excel(private_path, index=False)
+    invalidate_excel_cache(private_path)
     return jsonify({'message': 'Added'}), 200
 
 @inventory_bp.route('/private/fix-structure', methods=['POST'])
@@ -210,7 +189,7 @@ def fix_private_inventory_structure():
     try:
         if os.path.exists(private_path):
             # Read existing data
-            df = pd.read_excel(private_path)
+            df = read_excel_cached(private_path)
             
             # Define the correct columns
             required_columns = ['chemical_name', 'alias', 'cas_number', 'molecular_weight', 'smiles', 'barcode']
@@ -227,6 +206,7 @@ def fix_private_inventory_structure():
             
             # Save the corrected structure
             new_df.to_excel(private_path, index=False)
+            invalidate_excel_cache(private_path)
             
             return jsonify({'message': 'Private inventory structure fixed successfully'}), 200
         else:
@@ -244,15 +224,20 @@ def check_private_inventory():
         return jsonify({'exists': False}), 200
     
     try:
-        df = pd.read_excel(private_path)
+        df = read_excel_cached(private_path, prepare=prepare_inventory_frame, parse_dates=False)
         
-        # Check for matches by name, alias, CAS, or SMILES
-        name_match = df['chemical_name'].str.lower() == chemical.get('name', '').lower()
-        alias_match = df['alias'].str.lower() == chemical.get('alias', '').lower()
-        cas_match = df['cas_number'].astype(str) == str(chemical.get('cas', ''))
-        smiles_match = df['smiles'].astype(str).str.lower() == str(chemical.get('smiles', '')).lower()
+        # Check for matches by name, alias, CAS, or SMILES against the precomputed
+        # lowercase columns; empty values never match (missing cells are '' there)
+        name = chemical.get('name', '').lower()
+        alias = chemical.get('alias', '').lower()
+        cas = str(chemical.get('cas', ''))
+        smiles = str(chemical.get('smiles', '')).lower()
+        name_match = bool(name) and (df['_lc_chemical_name'] == name).any()
+        alias_match = bool(alias) and (df['_lc_alias'] == alias).any()
+        cas_match = bool(cas) and (df['cas_number'] == cas).any()
+        smiles_match = bool(smiles) and (df['_lc_smiles'] == smiles).any()
         
-        exists = (name_match | alias_match | cas_match | smiles_match).any()
+        exists = name_match or alias_match or cas_match or smiles_match
         return jsonify({'exists': bool(exists)}), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -2,14 +2,20 @@
 Kit routes blueprint.
 Handles kit analysis and application operations.
 """
+import logging
 import os
 import pandas as pd
 from flask import Blueprint, request, jsonify
 from state import current_experiment
+from state.excel_cache import EXCEL_ENGINE
+from utils import drop_blank_first_cell_rows, extract_materials, material_keys, add_material_keys, is_duplicate_material
 from app_original import (
     apply_kit_design_to_procedure, calculate_well_mappings, calculate_flexible_well_mappings
 )
 
+# Per-material and per-well details go to the debug log rather than stdout
+logger = logging.getLogger(__name__)
+
 # Create blueprint
 kit_bp = Blueprint('kit', __name__, url_prefix='/api/experiment/kit')
 
@@ -41,7 +47,8 @@ def analyze_kit():
         # Read the Excel file
         try:
             print("Attempting to read Excel file")
-            excel_file = pd.ExcelFile(file)
+            # One workbook load serves the sheet listing and every sheet read below
+            excel_file = pd.ExcelFile(file, engine=EXCEL_ENGINE)
             print(f"Excel sheets: {excel_file.sheet_names}")
         except Exception as e:
             print(f"Error reading Excel file: {str(e)}")
@@ -57,7 +64,7 @@ def analyze_kit():
         
         # Read the Materials sheet
         try:
-            materials_df = pd.read_excel(file, sheet_name='Materials')
+            materials_df = excel_file.parse('Materials')
             print(f"Materials sheet read successfully. Shape: {materials_df.shape}")
         except Exception as e:
             print(f"Error reading Materials sheet: {str(e)}")
@@ -65,7 +72,7 @@ def analyze_kit():
         
         # Read the Design sheet
         try:
-            design_df = pd.read_excel(file, sheet_name='Design')
+            design_df = excel_file.parse('Design')
             print(f"Design sheet read successfully. Shape: {design_df.shape}")
         except Exception as e:
             print(f"Error reading Design sheet: {str(e)}")
@@ -73,53 +80,34 @@ def analyze_kit():
         
         # Extract materials from the Materials sheet
         materials = []
-        for index, row in materials_df.iterrows():
-            # Skip empty rows
-            if pd.isna(row.iloc[0]) or str(row.iloc[0]).strip() == '':
-                continue
-            
-            # Extract material data based on expected columns (support both old and new column names)
-            # Helper function to clean and validate field values
-            def clean_field(value):
-                if pd.isna(value):
-                    return ''
-                str_value = str(value).strip()
-                # Return empty string for common "empty" representations
-                if str_value.lower() in ['nan', 'null', 'none', '']:
-                    return ''
-                return str_value
-            
-            material = {
-                'name': clean_field(row.get('chemical_name', row.get('Chemical_Name', row.get('Name', row.iloc[1] if len(row) > 1 else '')))),
-                'alias': clean_field(row.get('alias', row.get('Alias', ''))),
-                'cas': clean_field(row.get('cas_number', row.get('CAS_Number', row.get('CAS', '')))),
-                'smiles': clean_field(row.get('smiles', row.get('SMILES', ''))),
-                'molecular_weight': clean_field(row.get('molecular_weight', row.get('Molecular_Weight', row.get('Molecular Weight', '')))),
-                'barcode': clean_field(row.get('barcode', row.get('Barcode', row.get('Lot number', '')))),
-                'role': clean_field(row.get('role', row.get('Role', ''))),
-                'source': 'kit_upload'
-            }
-            
+        for material in extract_materials(materials_df, 'kit_upload'):
             # Only add if name or alias is not empty (allow materials with just alias)
-            if (material.get('name') and material.get('name') != 'nan') or (material.get('alias') and material.get('alias') != 'nan'):
+            if material['name'] or material['alias']:
                 materials.append(material)
-                print(f"Added material: name='{material.get('name', '')}', alias='{material.get('alias', '')}'")
+                logger.debug("Added material: name='%s', alias='%s'", material.get('name', ''), material.get('alias', ''))
             else:
-                print(f"Skipped material: name='{material.get('name', '')}', alias='{material.get('alias', '')}' (both empty)")
+                logger.debug("Skipped material: name='%s', alias='%s' (both empty)", material.get('name', ''), material.get('alias', ''))
         
         if not materials:
             return jsonify({'error': 'No valid materials found in the Materials sheet'}), 400
         
+        # Index materials by name and alias; the first material in sheet order wins
+        material_by_key = {}
+        for material in materials:
+            material_by_key.setdefault(material.get('name'), material)
+            material_by_key.setdefault(material.get('alias'), material)
+        
         # Extract design data from the Design sheet
         design_data = {}
         kit_wells = set()
         
-        for index, row in design_df.iterrows():
-            # Skip empty rows
-            if pd.isna(row.iloc[0]) or str(row.iloc[0]).strip() == '':
-                continue
-            
-            well = str(row.get('Well', row.iloc[0])).strip()
+        # Work on the raw cell values rather than per-row Series, skipping
+        # rows whose first cell is empty
+        design_values = drop_blank_first_cell_rows(design_df).to_numpy(dtype=object)
+        well_column = design_df.columns.get_loc('Well') if 'Well' in design_df.columns else 0
+        
+        for row in design_values:
+            well = str(row[well_column]).strip()
             if not well or well == 'nan':
                 continue
             
@@ -128,36 +116,33 @@ def analyze_kit():
             # Extract compounds and amounts from the row
             well_materials = []
             
-            # Look for compound columns (e.g., "Compound 1 name", "Compound 1 amount")
-            col_index = 2  # Start after Well and ID columns
-            while col_index < len(row):
-                if col_index + 1 < len(row):
-                    compound_name = str(row.iloc[col_index]).strip()
-                    compound_amount = str(row.iloc[col_index + 1]).strip()
-                    
-                    if compound_name and compound_name != 'nan' and compound_amount and compound_amount != 'nan':
-                        # Find the material in our materials list
-                        material = next((m for m in materials if m.get('name') == compound_name or m.get('alias') == compound_name), None)
-                        if material:
-                            # Include all material fields to ensure proper matching with materials list
-                            well_materials.append({
-                                'name': material.get('name', ''),
-                                'alias': material.get('alias', ''),
-                                'cas': material.get('cas', ''),
-                                'smiles': material.get('smiles', ''),
-                                'molecular_weight': material.get('molecular_weight', ''),
-                                'barcode': material.get('barcode', ''),
-                                'role': material.get('role', ''),
-                                'amount': compound_amount,
-                                'unit': 'μmol'  # Default unit
-                            })
-                            if well in ['A1', 'A12', 'B1', 'B12']:  # Debug corner wells
-                                print(f"DEBUG: Well {well}: Added '{compound_name}' -> material '{material.get('alias', '')}'")
-                        else:
-                            if well in ['A1', 'A12', 'B1', 'B12']:  # Debug corner wells
-                                print(f"DEBUG: Well {well}: Compound '{compound_name}' NOT FOUND in materials")
+            # Look for compound columns (e.g., "Compound 1 name", "Compound 1 amount"),
+            # starting after the Well and ID columns; zip drops an unpaired last column
+            for name_cell, amount_cell in zip(row[2::2], row[3::2]):
+                compound_name = str(name_cell).strip()
+                compound_amount = str(amount_cell).strip()
                 
-                col_index += 2  # Move to next compound pair
+                if compound_name and compound_name != 'nan' and compound_amount and compound_amount != 'nan':
+                    # Find the material in our materials list
+                    material = material_by_key.get(compound_name)
+                    if material:
+                        # Include all material fields to ensure proper matching with materials list
+                        well_materials.append({
+                            'name': material.get('name', ''),
+                            'alias': material.get('alias', ''),
+                            'cas': material.get('cas', ''),
+                            'smiles': material.get('smiles', ''),
+                            'molecular_weight': material.get('molecular_weight', ''),
+                            'barcode': material.get('barcode', ''),
+                            'role': material.get('role', ''),
+                            'amount': compound_amount,
+                            'unit': 'μmol'  # Default unit
+                        })
+                        if well in ['A1', 'A12', 'B1', 'B12']:  # Debug corner wells
+                            logger.debug("Well %s: Added '%s' -> material '%s'", well, compound_name, material.get('alias', ''))
+                    else:
+                        if well in ['A1', 'A12', 'B1', 'B12']:  # Debug corner wells
+                            logger.debug("Well %s: Compound '%s' NOT FOUND in materials", well, compound_name)
             
             if well_materials:
                 design_data[well] = well_materials
@@ -259,21 +244,18 @@ def apply_kit():
         # Add materials to experiment (avoiding duplicates)
         added_materials = []
         skipped_materials = []
+        existing_keys = material_keys(current_materials)
         
         for material in materials:
             # Check if material already exists (by name, CAS, or SMILES)
-            is_duplicate = any(
-                (existing.get('name') and material.get('name') and existing.get('name') == material.get('name')) or
-                (existing.get('cas') and material.get('cas') and existing.get('cas') == material.get('cas')) or
-                (existing.get('smiles') and material.get('smiles') and existing.get('smiles') == material.get('smiles'))
-                for existing in current_materials
-            )
+            is_duplicate = is_duplicate_material(material, existing_keys)
             
             if is_duplicate:
                 skipped_materials.append(material.get('alias') or material.get('name', 'Unknown'))
             else:
                 added_materials.append(material)
                 current_materials.append(material)
+                add_material_keys(existing_keys, material)
         
         # Apply design to procedure based on position
         new_procedure_data = apply_kit_design_to_procedure(design, position, kit_size, current_procedure, destination_plate)
@@ -65,11 +65,9 @@ def upload_sdf():
         return jsonify({'error': 'File must be in SDF format'}), 400
     
     try:
-        # Read file content
-        sdf_content = file.read().decode('utf-8')
-        
-        # Parse SDF file
-        molecules = parse_sdf_file(sdf_content)
+        # Parse SDF file straight from the upload stream (spooled to disk
+        # for large files) rather than decoding it into one string
+        molecules = parse_sdf_file(file.stream)
         
         if not molecules:
             return jsonify({'error': 'No valid molecules found in SDF file'}), 400
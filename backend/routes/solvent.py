@@ -4,12 +4,67 @@ Handles solvent database operations.
 """
 import os
 import re
+import numpy as np
 import pandas as pd
 from flask import Blueprint, request, jsonify
+from json_provider import jsonify_records
+from state import read_excel_cached
+from state.inventory import SEARCH_BLOB, build_search_blob, search_blob_mask
+from utils import frame_to_records
 
 # Create blueprint
 solvent_bp = Blueprint('solvent', __name__, url_prefix='/api/solvent')
 
+# Solvent.xlsx columns and the field names they are returned under
+RESPONSE_FIELDS = {
+    'Name': 'name',
+    'Alias': 'alias',
+    'CAS Number': 'cas',
+    'Molecular_weight': 'molecular_weight',
+    'SMILES': 'smiles',
+    'Boiling point': 'boiling_point',
+    'Chemical Class': 'chemical_class',
+    'Density (g/mL)': 'density',
+    'Tier': 'tier',
+}
+
+def is_response_column(column):
+    """usecols filter: parse only the Solvent.xlsx columns the endpoints use."""
+    return column in RESPONSE_FIELDS
+
+# Text columns matched by the solvent search
+SEARCH_COLUMNS = ('Name', 'Alias', 'CAS Number')
+
+# Numeric part of "Tier X" values
+_TIER_RE = re.compile(r'Tier\s*(\d+)', re.IGNORECASE)
+
+def add_search_columns(df):
+    """
+    Add lowercase '_lc_<column>' copies of the searchable columns ('' when missing)
+    and the combined SEARCH_BLOB column.
+    """
+    for col in SEARCH_COLUMNS:
+        df[f'_lc_{col}'] = df[col].astype(str).str.lower().where(df[col].notna(), '')
+    df[SEARCH_BLOB] = build_search_blob(df, [f'_lc_{col}' for col in SEARCH_COLUMNS])
+    return df
+
+def prepare_solvent_frame(df):
+    """
+    Precompute the solvent search helper columns once per file load.
+    
+    '_tier_num' holds the numeric tier, with inf for rows without a
+    "Tier X" value so they never pass a max-tier filter, and '_bp_num' the
+    boiling point as float64 (NaN when missing or non-numeric). Missing
+    values are filled with '' here rather than per request, except in
+    the boiling point columns.
+    """
+    df = add_search_columns(df)
+    df['_tier_num'] = df['Tier'].astype(str).str.extract(_TIER_RE)[0].astype(float).fillna(np.inf)
+    df['_bp_num'] = pd.to_numeric(df['Boiling point'], errors='coerce').astype(float)
+    df = df.fillna({col: '' for col in df.columns if col not in ('Boiling point', '_bp_num')})
+    df['_lc_Chemical Class'] = df['Chemical Class'].astype(str).str.lower()
+    return df
+
 @solvent_bp.route('/search', methods=['GET'])
 def search_solvents():
     """Search solvents in the Solvent.xlsx file"""
@@ -25,23 +80,15 @@ def search_solvents():
         return jsonify({'error': 'Solvent database not found'}), 404
     
     try:
-        df = pd.read_excel(solvent_path)
+        df = read_excel_cached(solvent_path, prepare=prepare_solvent_frame, usecols=is_response_column)
         
-        # Handle NaN values
-        df = df.fillna('')
-        
-        # Start with all data
-        results = df.copy()
+        # Filters are combined into a single boolean mask, applied once at the end
+        mask = np.ones(len(df), dtype=bool)
         
         # Apply text search if query provided
         if query:
-            text_filter = (
-                df['Name'].astype(str).str.lower().str.contains(query, na=False) |
-                df['Alias'].astype(str).str.lower().str.contains(query, na=False) |
-                df['CAS Number'].astype(str).str.lower().str.contains(query, na=False)
-            )
-            results = results[text_filter]
-            print(f"Text filter results: {len(results)} matches found")
+            mask &= search_blob_mask(df, query)
+            print(f"Text filter results: {mask.sum()} matches found")
         
         # Apply class filter if provided
         if class_filter:
@@ -55,62 +102,56 @@ def search_solvents():
                 class_variations.append(class_filter + 's')  # Add 's' for plural
             
             # Create a more flexible filter
-            class_mask = results['Chemical Class'].astype(str).str.lower().str.contains('|'.join(class_variations), na=False)
-            print(f"Class filter results: {class_mask.sum()} matches found")
-            print(f"Available classes in filtered data: {results['Chemical Class'].astype(str).unique()}")
-            results = results[class_mask]
+            mask &= df['_lc_Chemical Class'].str.contains('|'.join(class_variations), na=False).to_numpy()
+            print(f"Class filter results: {mask.sum()} matches found")
         
         # Apply boiling point filter if provided
         if bp_filter:
             try:
+                # NaN boiling points compare False, so rows without one never match
+                boiling_points = df['_bp_num'].to_numpy()
                 if bp_filter.startswith('>'):
                     bp_value = float(bp_filter[1:].strip())
-                    bp_mask = results['Boiling point'] > bp_value
+                    bp_mask = boiling_points > bp_value
                 elif bp_filter.startswith('<'):
                     bp_value = float(bp_filter[1:].strip())
-                    bp_mask = results['Boiling point'] < bp_value
+                    bp_mask = boiling_points < bp_value
                 else:
                     # Try to parse as exact value
                     bp_value = float(bp_filter)
                     tolerance = 5  # ±5°C tolerance
-                    bp_mask = (results['Boiling point'] >= bp_value - tolerance) & (results['Boiling point'] <= bp_value + tolerance)
+                    bp_mask = np.abs(boiling_points - bp_value) <= tolerance
                 
-                print(f"Boiling point filter results: {bp_mask.sum()} matches found")
-                results = results[bp_mask]
+                mask &= bp_mask
+                print(f"Boiling point filter results: {mask.sum()} matches found")
             except ValueError:
                 # If boiling point filter is invalid, return empty results
                 print("Invalid boiling point filter value")
-                results = pd.DataFrame()
+                return jsonify_records([])
         
         # Apply tier filter if provided
         if tier_filter:
             try:
                 max_tier = int(tier_filter)
-                # Extract numeric part from "Tier X" format
-                tier_numeric = results['Tier'].astype(str).str.extract(r'Tier\s*(\d+)')[0].astype(float)
-                tier_mask = tier_numeric <= max_tier
-                results = results[tier_mask]
+                mask &= (df['_tier_num'] <= max_tier).to_numpy()
             except ValueError:
                 # If tier filter is invalid, return empty results
-                results = pd.DataFrame()
+                return jsonify_records([])
+        
+        results = df[mask]
         
         # Convert to list of dictionaries with consistent field names
-        solvent_results = []
-        for _, row in results.iterrows():
-            solvent_results.append({
-                'name': row['Name'],
-                'alias': row['Alias'],
-                'cas': row['CAS Number'],
-                'molecular_weight': row['Molecular_weight'],
-                'smiles': row['SMILES'],
-                'boiling_point': row['Boiling point'],
-                'chemical_class': row['Chemical Class'],
-                'density': row['Density (g/mL)'],
-                'tier': row['Tier'],
-                'source': 'solvent_database'
-            })
-        
-        return jsonify(solvent_results)
+        if results.empty:
+            return jsonify_records([])
+        
+        solvent_results = results.rename(columns=RESPONSE_FIELDS)[list(RESPONSE_FIELDS.values())]
+        boiling_points = solvent_results['boiling_point']
+        solvent_results = frame_to_records(solvent_results.assign(
+            boiling_point=boiling_points.astype(object).where(boiling_points.notna(), ''),
+            source='solvent_database'
+        ))
+        
+        return jsonify_records(solvent_results)
         
     except Exception as e:
         return jsonify({'error': f'Error searching solvents: {str(e)}'}), 500
@@ -124,27 +165,11 @@ def get_solvent_tiers():
         return jsonify({'error': 'Solvent database not found'}), 404
     
     try:
-        df = pd.read_excel(solvent_path)
-        df = df.fillna('')
-        
-        # Get unique tiers
-        tiers = df['Tier'].astype(str).unique()
-        tiers = [tier.strip() for tier in tiers if tier.strip() and tier.strip().lower() != 'nan']
-        
-        # Extract numeric part from "Tier X" format and convert to integers
-        tier_numbers = []
-        for tier in tiers:
-            try:
-                # Extract number from "Tier X" format
-                match = re.search(r'Tier\s*(\d+)', tier, re.IGNORECASE)
-                if match:
-                    tier_numbers.append(int(match.group(1)))
-            except (ValueError, AttributeError):
-                continue
+        df = read_excel_cached(solvent_path, prepare=prepare_solvent_frame, usecols=is_response_column)
         
-        # Sort and convert back to strings
-        tier_numbers.sort()
-        tiers = [str(tier) for tier in tier_numbers]
+        # Unique numeric tiers from the precomputed "Tier X" column, sorted numerically
+        tier_numbers = np.unique(df['_tier_num'][np.isfinite(df['_tier_num'])])
+        tiers = [str(int(tier)) for tier in tier_numbers]
         
         return jsonify(tiers)
         
@@ -160,8 +185,7 @@ def get_solvent_classes():
         return jsonify({'error': 'Solvent database not found'}), 404
     
     try:
-        df = pd.read_excel(solvent_path)
-        df = df.fillna('')
+        df = read_excel_cached(solvent_path, prepare=prepare_solvent_frame, usecols=is_response_column)
         
         # Get unique chemical classes
         classes = df['Chemical Class'].astype(str).unique()
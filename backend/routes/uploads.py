@@ -2,11 +2,18 @@
 Upload routes blueprint.
 Handles file uploads for analytical data and materials.
 """
+import logging
 import os
 import pandas as pd
 from datetime import datetime
 from flask import Blueprint, request, jsonify
-from state import current_experiment, inventory_data, load_inventory
+from state import current_experiment, inventory_data, load_inventory, wait_for_inventory, read_excel_cached
+from state.excel_cache import EXCEL_ENGINE
+from state.inventory import build_cas_index, get_inventory_cas_index, prepare_inventory_frame
+from utils import get_plate_well_names, extract_materials, frame_to_records, material_keys, is_duplicate_material
+
+# Per-material and per-well details go to the debug log rather than stdout
+logger = logging.getLogger(__name__)
 
 # Create blueprint
 uploads_bp = Blueprint('uploads', __name__, url_prefix='/api/experiment')
@@ -21,22 +28,27 @@ def export_analytical_template():
         if not compounds:
             return jsonify({'error': 'No compounds provided'}), 400
         
-        # Create a new workbook
+        # Create a write-only workbook; rows are streamed instead of kept as a cell grid
         from openpyxl import Workbook
+        from openpyxl.cell import WriteOnlyCell
         from openpyxl.styles import Font, PatternFill
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Analytical Data"
+        from openpyxl.utils import get_column_letter
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet("Analytical Data")
         
         # Add headers - Well, Sample ID, then compound columns
         headers = ['Well', 'Sample ID']
         for i, compound in enumerate(compounds, 1):
             headers.extend([f'Name_{i}', f'Area_{i}'])
         
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col, value=header)
-            cell.font = Font(bold=True)
-            cell.fill = PatternFill(start_color="CCCCCC", end_color="CCCCCC", fill_type="solid")
+        header_font = Font(bold=True)
+        header_fill = PatternFill(start_color="CCCCCC", end_color="CCCCCC", fill_type="solid")
+        header_cells = []
+        for header in headers:
+            cell = WriteOnlyCell(ws, value=header)
+            cell.font = header_font
+            cell.fill = header_fill
+            header_cells.append(cell)
         
         # Get experiment context for ELN number and plate type
         context = current_experiment.get('context', {})
@@ -62,58 +74,35 @@ def export_analytical_template():
                 }
         
         plate_config = get_plate_config(plate_type)
-        rows = plate_config['rows']
-        columns = plate_config['columns']
-        
-        row_num = 2
-        for row in rows:
-            for col in columns:
-                well = f"{row}{col}"
-                sample_id = f"{eln_number}_{well}"  # Use underscore instead of hyphen
-                
-                # Add well and sample ID
-                ws.cell(row=row_num, column=1, value=well)
-                ws.cell(row=row_num, column=2, value=sample_id)
-                
-                # Add compound name and area columns
-                for compound_idx, compound in enumerate(compounds):
-                    # Cpd_(number)_Name column
-                    ws.cell(row=row_num, column=3 + (compound_idx * 2), value=compound)
-                    # Cmpd_(number)_area column (empty for user to fill)
-                    ws.cell(row=row_num, column=4 + (compound_idx * 2), value="")
-                
-                row_num += 1
-        
-        # Auto-adjust column widths
-        for column in ws.columns:
-            max_length = 0
-            column_letter = column[0].column_letter
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = min(max_length + 2, 50)
-            ws.column_dimensions[column_letter].width = adjusted_width
-        
-        # Save to temporary file
-        import tempfile
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as tmp_file:
-            wb.save(tmp_file.name)
-            tmp_file_path = tmp_file.name
-        
-        # Read the file and return it
-        with open(tmp_file_path, 'rb') as f:
-            file_content = f.read()
-        
-        # Clean up temporary file
-        os.unlink(tmp_file_path)
-        
+        wells = [f"{row}{col}" for row in plate_config['rows'] for col in plate_config['columns']]
+        
+        # Compound name and (empty, for the user to fill) area columns are the same for every well
+        compound_cells = []
+        for compound in compounds:
+            compound_cells.extend([compound, ""])
+        
+        # Column widths must be set before rows are written; size them from the
+        # longest value each column will hold, capped at 50
+        column_values = [wells, [f"{eln_number}_{well}" for well in wells]]
+        column_values.extend([value] for value in compound_cells)
+        for col, (header, values) in enumerate(zip(headers, column_values), 1):
+            max_length = max(len(str(value)) for value in [header, *values])
+            ws.column_dimensions[get_column_letter(col)].width = min(max_length + 2, 50)
+        
+        ws.append(header_cells)
+        for well in wells:
+            sample_id = f"{eln_number}_{well}"  # Use underscore instead of hyphen
+            ws.append([well, sample_id, *compound_cells])
+        
+        # Save straight into memory; no temporary file round-trip
         from flask import send_file
         import io
+        buffer = io.BytesIO()
+        wb.save(buffer)
+        buffer.seek(0)
+        
         return send_file(
-            io.BytesIO(file_content),
+            buffer,
             mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
             as_attachment=True,
             download_name=f'Analytical_Template_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
@@ -161,7 +150,7 @@ def upload_analytical_data():
             if file_ext == '.csv':
                 df = pd.read_csv(file)
             else:  # Excel files
-                df = pd.read_excel(file)
+                df = pd.read_excel(file, engine=EXCEL_ENGINE)
             print(f"File read successfully. Shape: {df.shape}")
         except Exception as e:
             print(f"Error reading file: {str(e)}")
@@ -176,32 +165,21 @@ def upload_analytical_data():
         area_columns = [col for col in df.columns if col.startswith('Area_')]
         print(f"Found area columns: {area_columns}")
         
-        # Pre-process area columns: replace empty cells with 0
-        for col in area_columns:
-            # First, replace various empty representations with NaN
-            df[col] = df[col].replace(['', ' ', 'nan', 'NaN', 'None', None], pd.NA)
-            # Fill NaN values with 0
-            df[col] = df[col].fillna(0)
-            print(f"Pre-processed column {col}: replaced empty cells with 0")
-        
-        # Check if area columns contain only numerical data
+        # Pre-process area columns in one vectorized pass: empty cells become 0,
+        # anything else that does not parse as a number invalidates its column
         invalid_area_columns = []
-        for col in area_columns:
-            try:
-                # Convert to numeric, coercing errors to NaN
-                numeric_col = pd.to_numeric(df[col], errors='coerce')
-                # Check if there are any NaN values (indicating non-numeric data)
-                # After our pre-processing, NaN should only occur for truly non-numeric data
-                if numeric_col.isna().any():
-                    invalid_area_columns.append(col)
-                    print(f"Column {col} contains non-numeric data")
-                    # Show which values couldn't be converted
-                    nan_mask = numeric_col.isna()
-                    problematic_values = df.loc[nan_mask, col].unique()
-                    print(f"Problematic values in {col}: {problematic_values}")
-            except Exception as e:
-                invalid_area_columns.append(col)
-                print(f"Error validating column {col}: {str(e)}")
+        if area_columns:
+            areas = df[area_columns]
+            empty_mask = areas.isna() | areas.isin(['', ' ', 'nan', 'NaN', 'None'])
+            numeric_areas = areas.apply(pd.to_numeric, errors='coerce')
+            invalid_mask = numeric_areas.isna() & ~empty_mask
+            invalid_area_columns = invalid_mask.columns[invalid_mask.any(axis=0)].tolist()
+            for col in invalid_area_columns:
+                print(f"Column {col} contains non-numeric data")
+                print(f"Problematic values in {col}: {areas.loc[invalid_mask[col], col].unique()}")
+            
+            df[area_columns] = numeric_areas.fillna(0)
+            print(f"Pre-processed area columns {area_columns}: replaced empty cells with 0")
         
         if invalid_area_columns:
             return jsonify({
@@ -217,9 +195,7 @@ def upload_analytical_data():
         
         # Process each row to ensure correct ID format
         processed_data = []
-        for _, row in df.iterrows():
-            processed_row = row.to_dict()  # Convert pandas Series to dict
-            
+        for processed_row in frame_to_records(df):
             # Handle ID column mapping - if file has 'ID' column but no 'Sample ID', map it
             id_value = None
             if 'Sample ID' in processed_row:
@@ -242,7 +218,7 @@ def upload_analytical_data():
                     correct_sample_id = f"{eln_number}_{well_part}"
                     processed_row['Sample ID'] = correct_sample_id
                     
-                    print(f"Mapped ID '{id_value}' to Sample ID '{correct_sample_id}'")
+                    logger.debug("Mapped ID '%s' to Sample ID '%s'", id_value, correct_sample_id)
             
             processed_data.append(processed_row)
         
@@ -257,21 +233,23 @@ def upload_analytical_data():
         }
         
         # Add to analytical data without overwriting existing data
-        if 'analytical_data' not in current_experiment:
-            current_experiment['analytical_data'] = {}
-        
-        # If analytical_data is a list (old format), convert it to new format
-        if isinstance(current_experiment['analytical_data'], list):
-            old_uploads = current_experiment['analytical_data']
-            current_experiment['analytical_data'] = {
-                'selectedCompounds': [],
-                'uploadedFiles': old_uploads
-            }
-        
-        if 'uploadedFiles' not in current_experiment['analytical_data']:
-            current_experiment['analytical_data']['uploadedFiles'] = []
-        
-        current_experiment['analytical_data']['uploadedFiles'].append(uploaded_data)
+        # Hold the experiment lock across the read-modify-write
+        with current_experiment.lock:
+            if 'analytical_data' not in current_experiment:
+                current_experiment['analytical_data'] = {}
+            
+            # If analytical_data is a list (old format), convert it to new format
+            if isinstance(current_experiment['analytical_data'], list):
+                old_uploads = current_experiment['analytical_data']
+                current_experiment['analytical_data'] = {
+                    'selectedCompounds': [],
+                    'uploadedFiles': old_uploads
+                }
+            
+            if 'uploadedFiles' not in current_experiment['analytical_data']:
+                current_experiment['analytical_data']['uploadedFiles'] = []
+            
+            current_experiment['analytical_data']['uploadedFiles'].append(uploaded_data)
         
         print(f"Upload successful. Current experiment keys: {list(current_experiment.keys())}")
         
@@ -296,6 +274,7 @@ def upload_materials_from_excel():
         print("Materials upload endpoint called")
         
         # Ensure inventory is loaded
+        wait_for_inventory()
         if not inventory_data:
             if not load_inventory():
                 print("Warning: Could not load inventory data")
@@ -322,7 +301,8 @@ def upload_materials_from_excel():
         # Read the Excel file
         try:
             print("Attempting to read Excel file")
-            excel_file = pd.ExcelFile(file)
+            # One workbook load serves the sheet listing and every sheet read below
+            excel_file = pd.ExcelFile(file, engine=EXCEL_ENGINE)
             print(f"Excel sheets: {excel_file.sheet_names}")
         except Exception as e:
             print(f"Error reading Excel file: {str(e)}")
@@ -334,51 +314,25 @@ def upload_materials_from_excel():
         
         # Read the Materials sheet
         try:
-            materials_df = pd.read_excel(file, sheet_name='Materials')
+            materials_df = excel_file.parse('Materials')
             print(f"Materials sheet read successfully. Shape: {materials_df.shape}")
         except Exception as e:
             print(f"Error reading Materials sheet: {str(e)}")
             return jsonify({'error': f'Error reading Materials sheet: {str(e)}'}), 400
         
-        # Extract materials from the sheet
-        materials = []
-        for index, row in materials_df.iterrows():
-            # Skip empty rows
-            if pd.isna(row.iloc[0]) or str(row.iloc[0]).strip() == '':
-                continue
-            
-            # Extract material data based on expected columns (support both old and new column names)
-            # Helper function to clean and validate field values
-            def clean_field(value):
-                if pd.isna(value):
-                    return ''
-                str_value = str(value).strip()
-                # Return empty string for common "empty" representations
-                if str_value.lower() in ['nan', 'null', 'none', '']:
-                    return ''
-                return str_value
-            
-            material = {
-                'name': clean_field(row.get('chemical_name', row.get('Chemical_Name', row.get('Name', row.iloc[1] if len(row) > 1 else '')))),
-                'alias': clean_field(row.get('alias', row.get('Alias', ''))),
-                'cas': clean_field(row.get('cas_number', row.get('CAS_Number', row.get('CAS', '')))),
-                'smiles': clean_field(row.get('smiles', row.get('SMILES', ''))),
-                'molecular_weight': clean_field(row.get('molecular_weight', row.get('Molecular_Weight', row.get('Molecular Weight', '')))),
-                'barcode': clean_field(row.get('barcode', row.get('Barcode', row.get('Lot number', '')))),
-                'role': clean_field(row.get('role', row.get('Role', ''))),
-                'source': 'excel_upload'
-            }
-            
-            # Only add if name is not empty
-            if material.get('name') and material.get('name') != 'nan':
-                materials.append(material)
+        # Extract materials from the sheet; only keep those with a name
+        materials = [
+            material for material in extract_materials(materials_df, 'excel_upload')
+            if material['name']
+        ]
         
         if not materials:
             return jsonify({'error': 'No valid materials found in the Materials sheet'}), 400
         
         print(f"Extracted {len(materials)} materials from Excel file")
-        for i, mat in enumerate(materials):
-            print(f"  Material {i+1}: {mat['name']} - CAS: {mat['cas']} - Alias: {mat['alias']}")
+        if logger.isEnabledFor(logging.DEBUG):
+            for i, mat in enumerate(materials):
+                logger.debug("  Material %s: %s - CAS: %s - Alias: %s", i+1, mat['name'], mat['cas'], mat['alias'])
         
         # Get current materials
         current_materials = current_experiment.get('materials', [])
@@ -386,61 +340,62 @@ def upload_materials_from_excel():
         # Check for duplicates and add new materials
         added_materials = []
         skipped_materials = []
+        inventory_matches = 0
+        excel_uploads = 0
+        
+        # CAS number -> row position lookups into the main and private inventories;
+        # the main inventory's index is kept between uploads until it is reloaded
+        main_df = None
+        main_cas_index = {}
+        private_df = None
+        private_cas_index = {}
+        if any(material.get('cas') for material in materials):
+            main_df, main_cas_index = get_inventory_cas_index()
+            
+            private_path = os.path.join(os.path.dirname(__file__), '..', '..', 'Private_Inventory.xlsx')
+            if os.path.exists(private_path):
+                try:
+                    # Cached and already normalized to str/None, like the main inventory
+                    private_df = read_excel_cached(private_path, prepare=prepare_inventory_frame, parse_dates=False)
+                    private_cas_index = build_cas_index(private_df)
+                except Exception as e:
+                    print(f"Error checking private inventory: {e}")
         
         # First, check all materials against the original current_materials list
+        existing_keys = material_keys(current_materials)
         for material in materials:
-            print(f"Processing material: {material.get('name', 'Unknown')} (CAS: {material.get('cas', 'Unknown')})")
+            logger.debug("Processing material: %s (CAS: %s)", material.get('name', 'Unknown'), material.get('cas', 'Unknown'))
             # Check if material already exists in current experiment (by name, CAS, or SMILES)
-            is_duplicate = any(
-                (existing.get('name') and material.get('name') and existing.get('name') == material.get('name')) or
-                (existing.get('cas') and material.get('cas') and existing.get('cas') == material.get('cas')) or
-                (existing.get('smiles') and material.get('smiles') and existing.get('smiles') == material.get('smiles'))
-                for existing in current_materials
-            )
+            is_duplicate = is_duplicate_material(material, existing_keys)
             
             if is_duplicate:
-                print(f"  -> Skipping {material.get('name', 'Unknown')} (duplicate)")
+                logger.debug("  -> Skipping %s (duplicate)", material.get('name', 'Unknown'))
                 skipped_materials.append(material.get('alias') or material.get('name', 'Unknown'))
             else:
                 # Check if material exists in inventory or private inventory by CAS number
                 inventory_material = None
                 if material.get('cas') and material.get('cas').strip():
+                    cas = material.get('cas').strip()
+                    
                     # Check main inventory
-                    if inventory_data:
-                        inventory_match = inventory_data[
-                            inventory_data['cas_number'].astype(str).str.strip() == material.get('cas').strip()
-                        ]
-                        if not inventory_match.empty:
-                            inventory_material = inventory_match.iloc[0].to_dict()
-                            print(f"  -> Found in main inventory: {inventory_material.get('chemical_name')}")
+                    if main_df is not None:
+                        if cas in main_cas_index:
+                            inventory_material = main_df.iloc[main_cas_index[cas]].to_dict()
+                            logger.debug("  -> Found in main inventory: %s", inventory_material.get('chemical_name'))
                         else:
-                            print(f"  -> Not found in main inventory")
+                            logger.debug("  -> Not found in main inventory")
                     
                     # Check private inventory if not found in main inventory
-                    if inventory_material is None:
-                        private_path = os.path.join(os.path.dirname(__file__), '..', '..', 'Private_Inventory.xlsx')
-                        if os.path.exists(private_path):
-                            try:
-                                private_df = pd.read_excel(private_path, parse_dates=False)
-                                # Convert all columns to string to avoid NaTType issues
-                                for col in private_df.columns:
-                                    private_df[col] = private_df[col].astype(str)
-                                    private_df[col] = private_df[col].replace('nan', None)
-                                
-                                private_match = private_df[
-                                    private_df['cas_number'].astype(str).str.strip() == material.get('cas').strip()
-                                ]
-                                if not private_match.empty:
-                                    inventory_material = private_match.iloc[0].to_dict()
-                                    print(f"  -> Found in private inventory: {inventory_material.get('chemical_name')}")
-                                else:
-                                    print(f"  -> Not found in private inventory")
-                            except Exception as e:
-                                print(f"Error checking private inventory: {e}")
+                    if inventory_material is None and private_df is not None:
+                        if cas in private_cas_index:
+                            inventory_material = private_df.iloc[private_cas_index[cas]].to_dict()
+                            logger.debug("  -> Found in private inventory: %s", inventory_material.get('chemical_name'))
+                        else:
+                            logger.debug("  -> Not found in private inventory")
                 
                 # Use inventory data if found, otherwise use uploaded data
                 if inventory_material:
-                    print(f"  -> Using inventory data for {material.get('name', 'Unknown')}")
+                    logger.debug("  -> Using inventory data for %s", material.get('name', 'Unknown'))
                     # Use inventory data but preserve some uploaded data
                     final_material = {
                         'name': inventory_material.get('chemical_name', material.get('name', '')),
@@ -454,11 +409,13 @@ def upload_materials_from_excel():
                         'inventory_location': inventory_material.get('location', ''),
                         'supplier': inventory_material.get('supplier', '')
                     }
+                    inventory_matches += 1
                 else:
-                    print(f"  -> Using uploaded data for {material.get('name', 'Unknown')}")
+                    logger.debug("  -> Using uploaded data for %s", material.get('name', 'Unknown'))
                     # Use uploaded data
                     final_material = material.copy()
                     final_material['source'] = 'excel_upload'
+                    excel_uploads += 1
                 
                 added_materials.append(final_material)
         
@@ -468,13 +425,10 @@ def upload_materials_from_excel():
         # Update the experiment materials
         current_experiment['materials'] = current_materials
         
-        # Count materials by source
-        inventory_matches = len([m for m in added_materials if m.get('source') == 'inventory_match'])
-        excel_uploads = len([m for m in added_materials if m.get('source') == 'excel_upload'])
-        
         print(f"Final results: Added {len(added_materials)} materials ({inventory_matches} from inventory, {excel_uploads} from upload data)")
-        for i, mat in enumerate(added_materials):
-            print(f"  Added {i+1}: {mat.get('name', 'Unknown')} (source: {mat.get('source', 'Unknown')})")
+        if logger.isEnabledFor(logging.DEBUG):
+            for i, mat in enumerate(added_materials):
+                logger.debug("  Added %s: %s (source: %s)", i+1, mat.get('name', 'Unknown'), mat.get('source', 'Unknown'))
         
         return jsonify({
             'message': 'Materials uploaded successfully',
@@ -505,31 +459,18 @@ def update_procedure_plate_type():
         print(f"Updating procedure plate type to: {new_plate_type}")
         
         # Store the plate type information in the experiment context
-        if 'context' not in current_experiment:
-            current_experiment['context'] = {}
-        
-        current_experiment['context']['plate_type'] = new_plate_type
+        # Hold the experiment lock across the read-modify-write
+        with current_experiment.lock:
+            if 'context' not in current_experiment:
+                current_experiment['context'] = {}
+            
+            current_experiment['context']['plate_type'] = new_plate_type
         
         # Validate that all wells in current procedure fit in the new plate type
-        plate_configs = {
-            '24': {'max_row': 'D', 'max_col': 6},
-            '48': {'max_row': 'F', 'max_col': 8},
-            '96': {'max_row': 'H', 'max_col': 12}
-        }
-        
-        plate_config = plate_configs.get(new_plate_type, plate_configs['96'])
+        plate_wells = get_plate_well_names(new_plate_type)
         
         # Filter out any procedure entries that don't fit in the new plate
-        valid_procedure = []
-        for entry in current_procedure:
-            well = entry.get('well', '')
-            if well and len(well) >= 2:
-                row_letter = well[0]
-                col_number = int(well[1:]) if well[1:].isdigit() else 0
-                
-                if (row_letter <= plate_config['max_row'] and 
-                    col_number <= plate_config['max_col']):
-                    valid_procedure.append(entry)
+        valid_procedure = [entry for entry in current_procedure if entry.get('well', '') in plate_wells]
         
         # Update the procedure with valid entries
         current_experiment['procedure'] = valid_procedure
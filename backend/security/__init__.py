@@ -3,11 +3,15 @@ Security utilities for HTE App.
 """
 from .file_validation import validate_file_upload, sanitize_filename
 from .rate_limiting import apply_rate_limits
-from .headers import add_security_headers
+from .cors import CORSMiddleware
+from .headers import add_security_headers, build_security_headers, SecurityHeadersMiddleware
 
 __all__ = [
     'validate_file_upload',
     'sanitize_filename', 
     'apply_rate_limits',
-    'add_security_headers'
+    'add_security_headers',
+    'build_security_headers',
+    'SecurityHeadersMiddleware',
+    'CORSMiddleware'
 ]
@@ -0,0 +1,57 @@
+"""
+CORS middleware.
+Replaces flask_cors with a WSGI layer whose origin check is a set lookup.
+"""
+
+class CORSMiddleware:
+    """WSGI middleware adding CORS headers and answering preflight requests."""
+    
+    def __init__(self, wsgi_app, origins, methods, headers):
+        self.wsgi_app = wsgi_app
+        self.origins = frozenset(origins)
+        self.wildcard = '*' in self.origins
+        methods_value = ', '.join(methods)
+        headers_value = ', '.join(headers)
+        
+        # Requests without an Origin header still get the configured origins,
+        # matching flask_cors' always_send behaviour
+        if self.wildcard:
+            self.default_headers = [('Access-Control-Allow-Origin', '*')]
+        else:
+            self.default_headers = [('Access-Control-Allow-Origin', origin) for origin in sorted(self.origins)]
+        if not self.wildcard and len(self.origins) > 1:
+            self.default_headers.append(('Vary', 'Origin'))
+        
+        self.preflight_headers = [
+            ('Access-Control-Allow-Methods', methods_value),
+            ('Access-Control-Allow-Headers', headers_value),
+            ('Content-Length', '0'),
+        ]
+        self.methods = frozenset(method.upper() for method in methods)
+    
+    def _origin_headers(self, origin):
+        """Return the CORS headers for a request Origin, or None if not allowed."""
+        if origin is None:
+            return self.default_headers
+        if self.wildcard:
+            return [('Access-Control-Allow-Origin', '*')]
+        if origin in self.origins:
+            return [('Access-Control-Allow-Origin', origin), ('Vary', 'Origin')]
+        return None
+    
+    def __call__(self, environ, start_response):
+        origin_headers = self._origin_headers(environ.get('HTTP_ORIGIN'))
+        if origin_headers is None:
+            return self.wsgi_app(environ, start_response)
+        
+        # Answer preflight requests directly without dispatching to Flask
+        if (environ.get('REQUEST_METHOD') == 'OPTIONS'
+                and environ.get('HTTP_ACCESS_CONTROL_REQUEST_METHOD', '').upper() in self.methods):
+            start_response('204 No Content', origin_headers + self.preflight_headers)
+            return [b'']
+        
+        def add_headers(status, response_headers, exc_info=None):
+            response_headers.extend(origin_headers)
+            return start_response(status, response_headers, exc_info)
+        
+        return self.wsgi_app(environ, add_headers)
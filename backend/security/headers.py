@@ -3,20 +3,52 @@ Security headers middleware.
 """
 from flask import current_app
 
+CONTENT_SECURITY_POLICY = (
+    "default-src 'self'; "
+    "script-src 'self' 'unsafe-inline'; "
+    "style-src 'self' 'unsafe-inline'; "
+    "img-src 'self' data:; "
+    "font-src 'self'; "
+    "connect-src 'self'; "
+    "frame-ancestors 'none';"
+)
+
+def build_security_headers(config) -> list[tuple[str, str]]:
+    """Build the static security header list for an app config."""
+    headers = [
+        ('X-Content-Type-Options', 'nosniff'),
+        ('X-Frame-Options', 'DENY'),
+        ('X-XSS-Protection', '1; mode=block'),
+        ('Referrer-Policy', 'strict-origin-when-cross-origin'),
+    ]
+    
+    # CSP and HSTS only outside debug mode
+    if not config.get('DEBUG', False):
+        headers.append(('Content-Security-Policy', CONTENT_SECURITY_POLICY))
+        headers.append(('Strict-Transport-Security', 'max-age=31536000; includeSubDomains'))
+    
+    return headers
+
+class SecurityHeadersMiddleware:
+    """WSGI middleware appending a precomputed header list to every response."""
+    
+    def __init__(self, wsgi_app, headers):
+        self.wsgi_app = wsgi_app
+        self.headers = list(headers)
+    
+    def __call__(self, environ, start_response):
+        def add_headers(status, response_headers, exc_info=None):
+            response_headers.extend(self.headers)
+            return start_response(status, response_headers, exc_info)
+        
+        return self.wsgi_app(environ, add_headers)
+
 def add_security_headers(response):
     """Add security headers to response."""
     
     # Content Security Policy
     if not current_app.config.get('DEBUG', False):
-        response.headers['Content-Security-Policy'] = (
-            "default-src 'self'; "
-            "script-src 'self' 'unsafe-inline'; "
-            "style-src 'self' 'unsafe-inline'; "
-            "img-src 'self' data:; "
-            "font-src 'self'; "
-            "connect-src 'self'; "
-            "frame-ancestors 'none';"
-        )
+        response.headers['Content-Security-Policy'] = CONTENT_SECURITY_POLICY
     
     # Prevent MIME type sniffing
     response.headers['X-Content-Type-Options'] = 'nosniff'
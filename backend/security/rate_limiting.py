@@ -1,14 +1,90 @@
 """
 Simple rate limiting for uploads.
+
+Counters live in process memory by default. When RATE_LIMIT_STORAGE_URL points
+at a Redis server, each check is a single atomic Lua script instead, so the
+limit is shared by all workers.
+
+With RATE_LIMIT_MODE = 'proxy' enforcement is left to the reverse proxy (e.g.
+Envoy's ratelimit service or nginx limit_req), which must set a trusted
+X-RateLimit-Remaining header and strip any client-supplied one; requests
+arriving with a remaining count of 0 are rejected without further checks.
 """
 import time
+import uuid
 from collections import defaultdict, deque
-from flask import request, current_app
+from functools import lru_cache
+from flask import request, current_app, g
+
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+# Health checks and static files never count toward the limits
+EXEMPT_PATHS = frozenset(('/healthz', '/readyz', '/favicon.ico'))
 
 # Simple in-memory rate limiter
 upload_attempts = defaultdict(deque)
 api_attempts = defaultdict(deque)
 
+# Sliding window: drop expired entries, count, and record the attempt if allowed
+SLIDING_WINDOW_SCRIPT = """
+local key = KEYS[1]
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local limit = tonumber(ARGV[3])
+redis.call('ZREMRANGEBYSCORE', key, '-inf', now - window)
+local count = redis.call('ZCARD', key)
+if count >= limit then
+    return {1, count}
+end
+redis.call('ZADD', key, now, ARGV[4])
+redis.call('EXPIRE', key, math.ceil(window))
+return {0, count + 1}
+"""
+
+# Concurrency slots: entries older than the TTL are treated as leaked and dropped
+CONCURRENT_REQUESTS_SCRIPT = """
+local key = KEYS[1]
+local now = tonumber(ARGV[1])
+local ttl = tonumber(ARGV[2])
+local limit = tonumber(ARGV[3])
+redis.call('ZREMRANGEBYSCORE', key, '-inf', now - ttl)
+if redis.call('ZCARD', key) >= limit then
+    return 0
+end
+redis.call('ZADD', key, now, ARGV[4])
+redis.call('EXPIRE', key, ttl)
+return 1
+"""
+
+@lru_cache(maxsize=None)
+def _redis_scripts(url: str):
+    """Connect to Redis once per URL and register the limiter scripts."""
+    client = redis.Redis.from_url(url)
+    return (
+        client,
+        client.register_script(SLIDING_WINDOW_SCRIPT),
+        client.register_script(CONCURRENT_REQUESTS_SCRIPT)
+    )
+
+def _get_redis_scripts():
+    """Return the Redis client and scripts, or None when using in-memory limits."""
+    url = current_app.config.get('RATE_LIMIT_STORAGE_URL')
+    if not url or not REDIS_AVAILABLE:
+        return None
+    return _redis_scripts(url)
+
+def _get_window(limit_type: str) -> tuple[int, int]:
+    """Return (window seconds, max requests) for a limit type."""
+    if limit_type == 'upload':
+        return (current_app.config.get('UPLOAD_RATE_WINDOW', 300),
+                current_app.config.get('UPLOAD_RATE_LIMIT', 10))
+    return (current_app.config.get('API_RATE_WINDOW', 60),
+            current_app.config.get('API_RATE_LIMIT', 100))
+
 def is_rate_limited(ip: str, limit_type: str = 'api') -> tuple[bool, str]:
     """
     Check if IP is rate limited.
@@ -23,14 +99,24 @@ def is_rate_limited(ip: str, limit_type: str = 'api') -> tuple[bool, str]:
     now = time.time()
     
     # Get rate limits from config
-    if limit_type == 'upload':
-        window = current_app.config.get('UPLOAD_RATE_WINDOW', 300)  # 5 minutes
-        max_requests = current_app.config.get('UPLOAD_RATE_LIMIT', 10)  # 10 uploads per 5 min
-        attempts = upload_attempts[ip]
-    else:
-        window = current_app.config.get('API_RATE_WINDOW', 60)  # 1 minute
-        max_requests = current_app.config.get('API_RATE_LIMIT', 100)  # 100 requests per minute (default matches config)
-        attempts = api_attempts[ip]
+    window, max_requests = _get_window(limit_type)
+    
+    scripts = _get_redis_scripts()
+    if scripts is not None:
+        _, sliding_window, _ = scripts
+        try:
+            limited, count = sliding_window(
+                keys=[f'rate:{limit_type}:{ip}'],
+                args=[now, window, max_requests, uuid.uuid4().hex]
+            )
+        except redis.RedisError as e:
+            current_app.logger.warning("Redis rate limiter unavailable, using in-memory limits: %s", e)
+        else:
+            if limited:
+                return True, f"Rate limit exceeded: {max_requests} {limit_type} requests per {window} seconds"
+            return False, ""
+    
+    attempts = upload_attempts[ip] if limit_type == 'upload' else api_attempts[ip]
     
     # Remove old attempts outside the window
     while attempts and attempts[0] < now - window:
@@ -45,33 +131,104 @@ def is_rate_limited(ip: str, limit_type: str = 'api') -> tuple[bool, str]:
     
     # Log in debug mode for development
     if current_app.config.get('DEBUG', False):
-        current_app.logger.debug(f"Rate limit check for IP {ip}: {len(attempts)}/{max_requests} {limit_type} requests in {window}s window")
+        current_app.logger.debug("Rate limit check for IP %s: %d/%d %s requests in %ss window",
+                                 ip, len(attempts), max_requests, limit_type, window)
     
     return False, ""
 
+def acquire_concurrency_slot(ip: str) -> bool:
+    """
+    Reserve one in-flight request slot for IP (Redis only).
+    
+    Returns False when the IP already has CONCURRENT_REQUEST_LIMIT requests
+    in flight. The slot is released by release_concurrency_slot().
+    """
+    limit = current_app.config.get('CONCURRENT_REQUEST_LIMIT', 0)
+    scripts = _get_redis_scripts()
+    if not limit or scripts is None:
+        return True
+    
+    _, _, concurrent_requests = scripts
+    key = f'concurrent:{ip}'
+    slot = uuid.uuid4().hex
+    try:
+        acquired = concurrent_requests(
+            keys=[key],
+            args=[time.time(), current_app.config.get('CONCURRENT_REQUEST_TTL', 60), limit, slot]
+        )
+    except redis.RedisError as e:
+        current_app.logger.warning("Redis concurrency limiter unavailable: %s", e)
+        return True
+    
+    if acquired:
+        g.concurrency_slot = (key, slot)
+    return bool(acquired)
+
+def release_concurrency_slot(exc=None):
+    """Release the slot taken by acquire_concurrency_slot() (teardown_request hook)."""
+    reserved = g.pop('concurrency_slot', None)
+    scripts = _get_redis_scripts()
+    if reserved is None or scripts is None:
+        return
+    
+    client, _, _ = scripts
+    try:
+        client.zrem(*reserved)
+    except redis.RedisError as e:
+        current_app.logger.warning("Failed to release concurrency slot: %s", e)
+
+def get_client_ip() -> str:
+    """Client IP of the current request, the first X-Forwarded-For hop if behind a proxy."""
+    ip = request.environ.get('HTTP_X_FORWARDED_FOR', request.remote_addr)
+    if ',' in ip:
+        ip = ip.split(',')[0].strip()  # Take first IP if multiple
+    return ip
+
 def apply_rate_limits():
     """Apply rate limiting to current request."""
     if not current_app.config.get('RATE_LIMITING_ENABLED', True):
         return None
     
+    # The proxy has already counted this request; only honour its verdict
+    if current_app.config.get('RATE_LIMIT_MODE', 'local') == 'proxy':
+        if request.headers.get('X-RateLimit-Remaining') == '0':
+            from flask import jsonify
+            return jsonify({
+                'error': 'Rate Limit Exceeded',
+                'message': 'Rate limit exceeded',
+                'status_code': 429
+            }), 429
+        return None
+    
+    path = request.path
+    if path in EXEMPT_PATHS or path.startswith(f'{current_app.static_url_path}/'):
+        return None
+    
     # Get client IP
-    ip = request.environ.get('HTTP_X_FORWARDED_FOR', request.remote_addr)
-    if ',' in ip:
-        ip = ip.split(',')[0].strip()  # Take first IP if multiple
+    ip = get_client_ip()
     
     # Determine limit type based on endpoint
-    limit_type = 'upload' if '/upload' in request.path else 'api'
+    limit_type = 'upload' if '/upload' in path else 'api'
     
     # Check rate limit
     is_limited, error_msg = is_rate_limited(ip, limit_type)
     
     if is_limited:
         from flask import jsonify
-        current_app.logger.warning(f"Rate limit exceeded for IP {ip}: {error_msg}")
+        current_app.logger.warning("Rate limit exceeded for IP %s: %s", ip, error_msg)
         return jsonify({
             'error': 'Rate Limit Exceeded',
             'message': error_msg,
             'status_code': 429
         }), 429
     
+    if not acquire_concurrency_slot(ip):
+        from flask import jsonify
+        current_app.logger.warning("Concurrent request limit exceeded for IP %s", ip)
+        return jsonify({
+            'error': 'Rate Limit Exceeded',
+            'message': 'Too many concurrent requests',
+            'status_code': 429
+        }), 429
+    
     return None
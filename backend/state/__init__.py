@@ -2,12 +2,18 @@
 State management module for HTE App.
 Provides thread-safe access to global application state.
 """
-from .experiment import current_experiment, reset_experiment
-from .inventory import inventory_data, load_inventory
+from .experiment import current_experiment, reset_experiment, reset_all_experiments
+from .excel_cache import read_excel_cached, invalidate_excel_cache
+from .inventory import inventory_data, load_inventory, load_inventory_in_background, wait_for_inventory
 
 __all__ = [
     'current_experiment',
     'reset_experiment', 
+    'reset_all_experiments',
     'inventory_data',
-    'load_inventory'
+    'load_inventory',
+    'load_inventory_in_background',
+    'wait_for_inventory',
+    'read_excel_cached',
+    'invalidate_excel_cache'
 ]
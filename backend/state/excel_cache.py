@@ -0,0 +1,62 @@
+"""
+Excel file cache.
+Parsed spreadsheets are kept in memory and reused until the file changes on disk.
+"""
+import os
+import threading
+
+# python-calamine parses XLSX in Rust, several times faster than openpyxl;
+# without it pandas falls back to its default engine
+try:
+    import python_calamine  # noqa: F401
+    EXCEL_ENGINE = 'calamine'
+except ImportError:
+    EXCEL_ENGINE = None
+
+# Thread lock for the cache
+_excel_cache_lock = threading.RLock()
+
+# (absolute path, read options) -> ((mtime_ns, size), DataFrame)
+_excel_cache = {}
+
+def read_excel_cached(path, prepare=None, **kwargs):
+    """
+    Read an Excel file, reusing the parsed DataFrame while the file is unchanged.
+    
+    The cache entry is keyed by path, read options and the optional `prepare`
+    callable, which runs once per file version on the freshly parsed frame
+    (e.g. to add derived columns). Entries are validated against the file's
+    mtime and size. Callers get a shallow copy, so adding or replacing columns
+    does not affect the cached frame; in-place cell edits would.
+    
+    Files are parsed with the calamine engine when python-calamine is
+    installed, unless the caller passes an explicit `engine`.
+    """
+    import pandas as pd
+    
+    kwargs.setdefault('engine', EXCEL_ENGINE)
+    key = (os.path.abspath(path), prepare, tuple(sorted(kwargs.items())))
+    stat = os.stat(path)
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    
+    with _excel_cache_lock:
+        cached = _excel_cache.get(key)
+    if cached is not None and cached[0] == stamp:
+        return cached[1].copy(deep=False)
+    
+    df = pd.read_excel(path, **kwargs)
+    if prepare is not None:
+        df = prepare(df)
+    with _excel_cache_lock:
+        _excel_cache[key] = (stamp, df)
+    return df.copy(deep=False)
+
+def invalidate_excel_cache(path=None):
+    """Drop cached frames for one file, or for all files if path is None."""
+    with _excel_cache_lock:
+        if path is None:
+            _excel_cache.clear()
+            return
+        abs_path = os.path.abspath(path)
+        for key in [key for key in _excel_cache if key[0] == abs_path]:
+            del _excel_cache[key]
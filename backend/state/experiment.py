@@ -1,144 +1,267 @@
 """
 Experiment state management.
-Handles the global current_experiment state with thread safety.
+Handles the current_experiment state with thread safety, one experiment per
+client session (see SESSION_HEADER).
 """
+import re
 import threading
-from typing import Dict, Any, List
+import time
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+from flask import has_request_context, request
+from werkzeug.exceptions import BadRequest, ServiceUnavailable, TooManyRequests
 
 # Thread lock for experiment state
 _experiment_lock = threading.RLock()
 
-# Global experiment state
-_current_experiment = {
-    'context': {},
-    'materials': [],
-    'procedure': [],
-    'procedure_settings': {
-        'reactionConditions': {
-            'temperature': '',
-            'time': '',
-            'pressure': '',
-            'wavelength': '',
-            'remarks': ''
+# Request header naming the client's experiment session. Requests without it
+# share the default experiment, as single-user installs always have.
+SESSION_HEADER = 'X-Session-Id'
+
+# Session ids as the frontend makes them: crypto.randomUUID(), or its fallback
+# '<time base36>-<random base36>'. Anything else is rejected with a 400.
+SESSION_ID_MAX_LENGTH = 36
+SESSION_ID_PATTERN = re.compile(
+    r'[0-9a-f]{8}(?:-[0-9a-f]{4}){3}-[0-9a-f]{12}|[0-9a-z]{1,16}-[0-9a-z]{1,16}'
+)
+
+# Requests with these methods never create a session; unknown sessions read as empty
+READ_ONLY_METHODS = frozenset(('GET', 'HEAD', 'OPTIONS'))
+
+# Experiments of named sessions are dropped once unused for this long
+SESSION_IDLE_TIMEOUT = 12 * 60 * 60  # seconds
+
+# New sessions are refused (503) while this many sessions are in use;
+# sessions used within SESSION_IDLE_TIMEOUT are never dropped to make room
+MAX_SESSIONS = 1000
+
+# One client (IP) can hold at most this many sessions, so it cannot fill the store
+MAX_SESSIONS_PER_CLIENT = 20
+
+class InvalidSessionError(BadRequest):
+    """Raised when the session header is not a session id the frontend would send."""
+    description = f'Invalid {SESSION_HEADER} header'
+
+class SessionLimitError(ServiceUnavailable):
+    """Raised when a new session would exceed MAX_SESSIONS."""
+    description = 'Too many active experiment sessions; try again later'
+
+class ClientSessionLimitError(TooManyRequests):
+    """Raised when a new session would exceed MAX_SESSIONS_PER_CLIENT."""
+    description = 'Too many experiment sessions from this client; try again later'
+
+def _new_experiment() -> Dict[str, Any]:
+    """A fresh, empty experiment."""
+    return {
+        'context': {},
+        'materials': [],
+        'procedure': [],
+        'procedure_settings': {
+            'reactionConditions': {
+                'temperature': '',
+                'time': '',
+                'pressure': '',
+                'wavelength': '',
+                'remarks': ''
+            },
+            'analyticalDetails': {
+                'uplcNumber': '',
+                'method': '',
+                'duration': '',
+                'remarks': ''
+            }
+        },
+        'analytical_data': {
+            'selectedCompounds': [],
+            'uploadedFiles': []
         },
-        'analyticalDetails': {
-            'uplcNumber': '',
-            'method': '',
-            'duration': '',
-            'remarks': ''
-        }
-    },
-    'analytical_data': {
-        'selectedCompounds': [],
-        'uploadedFiles': []
-    },
-    'results': []
-}
+        'results': []
+    }
+
+# Default experiment, for requests without a session header
+_current_experiment = _new_experiment()
+
+# Session id -> (last used, experiment, client IP), in least to most recently used order
+_session_experiments: "OrderedDict[str, Tuple[float, Dict[str, Any], str]]" = OrderedDict()
+
+# Client IP -> number of its sessions in _session_experiments
+_client_session_counts: Dict[str, int] = {}
+
+def _session_id() -> Optional[str]:
+    """
+    Session id sent with the current request, or None outside requests or
+    without the header. Raises InvalidSessionError for malformed ids.
+    """
+    if not has_request_context():
+        return None
+    session_id = request.headers.get(SESSION_HEADER)
+    if not session_id:
+        return None
+    if len(session_id) > SESSION_ID_MAX_LENGTH or not SESSION_ID_PATTERN.fullmatch(session_id):
+        raise InvalidSessionError()
+    return session_id
+
+def check_session_header() -> None:
+    """Reject a malformed session header up front (before_request hook)."""
+    _session_id()
+
+def _forget_client_session(client: str) -> None:
+    """Decrement a client's session count (call with the lock held)."""
+    remaining = _client_session_counts.get(client, 0) - 1
+    if remaining > 0:
+        _client_session_counts[client] = remaining
+    else:
+        _client_session_counts.pop(client, None)
+
+def _expire_sessions(now: float) -> None:
+    """Drop sessions unused for SESSION_IDLE_TIMEOUT (call with the lock held)."""
+    while _session_experiments:
+        last_used, _, _ = next(iter(_session_experiments.values()))
+        if now - last_used < SESSION_IDLE_TIMEOUT:
+            break
+        _, (_, _, client) = _session_experiments.popitem(last=False)
+        _forget_client_session(client)
+
+def _use_session(session_id: str, reset: bool = False, create: bool = True) -> Dict[str, Any]:
+    """
+    Mark a session as used now and return its experiment, created if new or
+    reset (call with the lock held). With create=False an unknown session gets
+    a throwaway empty experiment and is not stored.
+    
+    Raises ClientSessionLimitError or SessionLimitError rather than dropping a
+    live session when a new one would exceed MAX_SESSIONS_PER_CLIENT or MAX_SESSIONS.
+    """
+    from security.rate_limiting import get_client_ip
+    
+    now = time.monotonic()
+    _expire_sessions(now)
+    entry = _session_experiments.pop(session_id, None)
+    if entry is None:
+        if not create:
+            return _new_experiment()
+        client = get_client_ip()
+        if _client_session_counts.get(client, 0) >= MAX_SESSIONS_PER_CLIENT:
+            raise ClientSessionLimitError()
+        if len(_session_experiments) >= MAX_SESSIONS:
+            raise SessionLimitError()
+        _client_session_counts[client] = _client_session_counts.get(client, 0) + 1
+        experiment = _new_experiment()
+    else:
+        _, experiment, client = entry
+        if reset:
+            experiment = _new_experiment()
+    _session_experiments[session_id] = (now, experiment, client)
+    return experiment
+
+def _session_experiment() -> Dict[str, Any]:
+    """The experiment of the current request's session (call with the lock held)."""
+    session_id = _session_id()
+    if session_id is None:
+        return _current_experiment
+    return _use_session(session_id, create=request.method not in READ_ONLY_METHODS)
 
 def get_current_experiment() -> Dict[str, Any]:
     """Get a copy of the current experiment state."""
     with _experiment_lock:
         # Return a deep copy to prevent external modifications
         import copy
-        return copy.deepcopy(_current_experiment)
+        return copy.deepcopy(_session_experiment())
 
 def update_experiment_context(context: Dict[str, Any]) -> None:
     """Update experiment context."""
     with _experiment_lock:
-        _current_experiment['context'] = context
+        _session_experiment()['context'] = context
 
 def update_experiment_materials(materials: List[Dict[str, Any]]) -> None:
     """Update experiment materials."""
     with _experiment_lock:
-        _current_experiment['materials'] = materials
+        _session_experiment()['materials'] = materials
 
 def update_experiment_procedure(procedure: List[Dict[str, Any]]) -> None:
     """Update experiment procedure."""
     with _experiment_lock:
-        _current_experiment['procedure'] = procedure
+        _session_experiment()['procedure'] = procedure
 
 def update_experiment_procedure_settings(settings: Dict[str, Any]) -> None:
     """Update experiment procedure settings."""
     with _experiment_lock:
-        _current_experiment['procedure_settings'] = settings
+        _session_experiment()['procedure_settings'] = settings
 
 def update_experiment_analytical_data(analytical_data: Dict[str, Any]) -> None:
     """Update experiment analytical data."""
     with _experiment_lock:
-        _current_experiment['analytical_data'] = analytical_data
+        _session_experiment()['analytical_data'] = analytical_data
 
 def update_experiment_results(results: List[Dict[str, Any]]) -> None:
     """Update experiment results."""
     with _experiment_lock:
-        _current_experiment['results'] = results
+        _session_experiment()['results'] = results
 
 def update_experiment_heatmap_data(heatmap_data: Dict[str, Any]) -> None:
     """Update experiment heatmap data."""
     with _experiment_lock:
-        _current_experiment['heatmap_data'] = heatmap_data
+        _session_experiment()['heatmap_data'] = heatmap_data
 
 def reset_experiment() -> None:
-    """Reset experiment to initial state."""
+    """Reset the current session's experiment to initial state."""
     with _experiment_lock:
         global _current_experiment
-        _current_experiment = {
-            'context': {},
-            'materials': [],
-            'procedure': [],
-            'procedure_settings': {
-                'reactionConditions': {
-                    'temperature': '',
-                    'time': '',
-                    'pressure': '',
-                    'wavelength': '',
-                    'remarks': ''
-                },
-                'analyticalDetails': {
-                    'uplcNumber': '',
-                    'method': '',
-                    'duration': '',
-                    'remarks': ''
-                }
-            },
-            'analytical_data': {
-                'selectedCompounds': [],
-                'uploadedFiles': []
-            },
-            'results': []
-        }
+        session_id = _session_id()
+        if session_id is None:
+            _current_experiment = _new_experiment()
+        else:
+            _use_session(session_id, reset=True)
+
+def reset_all_experiments() -> None:
+    """Reset the default experiment and drop every session's experiment."""
+    with _experiment_lock:
+        global _current_experiment
+        _current_experiment = _new_experiment()
+        _session_experiments.clear()
+        _client_session_counts.clear()
 
 # For backward compatibility, provide direct access to the state
 # This will be removed in future phases when all code uses the functions above
 class ExperimentState:
     """Backward compatibility wrapper for experiment state."""
     
+    @property
+    def lock(self):
+        """
+        The experiment lock, for compound read-modify-write operations.
+        
+        Single item access is already locked; hold this around sequences
+        such as "create the dict if missing, then append to it".
+        """
+        return _experiment_lock
+    
     def __getitem__(self, key):
         with _experiment_lock:
-            return _current_experiment[key]
+            return _session_experiment()[key]
     
     def __contains__(self, key):
         with _experiment_lock:
-            return key in _current_experiment
+            return key in _session_experiment()
     
     def __setitem__(self, key, value):
         with _experiment_lock:
-            _current_experiment[key] = value
+            _session_experiment()[key] = value
     
     def get(self, key, default=None):
         with _experiment_lock:
-            return _current_experiment.get(key, default)
+            return _session_experiment().get(key, default)
     
     def keys(self):
         with _experiment_lock:
-            return _current_experiment.keys()
+            return _session_experiment().keys()
     
     def values(self):
         with _experiment_lock:
-            return _current_experiment.values()
+            return _session_experiment().values()
     
     def items(self):
         with _experiment_lock:
-            return _current_experiment.items()
+            return _session_experiment().items()
 
 # Global instance for backward compatibility
 current_experiment = ExperimentState()
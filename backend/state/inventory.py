@@ -3,9 +3,13 @@ Inventory state management.
 Handles the global inventory_data state with thread safety.
 """
 import os
+import gzip
 import threading
+import numpy as np
 import pandas as pd
 from typing import Optional
+from json_provider import dump_records
+from utils import frame_to_records
 
 # Thread lock for inventory state
 _inventory_lock = threading.RLock()
@@ -13,6 +17,28 @@ _inventory_lock = threading.RLock()
 # Global inventory state
 _inventory_data: Optional[pd.DataFrame] = None
 
+# Lookup indexes into _inventory_data by builder function, built on first use
+# after each load
+_inventory_indexes: dict = {}
+
+# Text columns matched by the inventory search
+SEARCH_COLUMNS = ('chemical_name', 'alias', 'cas_number', 'smiles')
+
+# All lowercase search columns joined into one string per row, so a search is
+# a single substring scan; the separator cannot occur in spreadsheet text
+SEARCH_BLOB = '_search_blob'
+SEARCH_SEPARATOR = '\x00'
+
+# The gzipped inventory JSON is built once per load, so spend the time on the best ratio
+INVENTORY_GZIP_LEVEL = 9
+
+# Cleared while a background load is in flight
+_inventory_ready = threading.Event()
+_inventory_ready.set()
+
+# Thread of the background load in flight, shared by every app in the process
+_inventory_loader: Optional[threading.Thread] = None
+
 def get_inventory_data() -> Optional[pd.DataFrame]:
     """Get a copy of the inventory data."""
     with _inventory_lock:
@@ -23,6 +49,114 @@ def set_inventory_data(data: pd.DataFrame) -> None:
     with _inventory_lock:
         global _inventory_data
         _inventory_data = data
+        _inventory_indexes.clear()
+
+def _get_inventory_index(builder):
+    """
+    Return (inventory DataFrame, builder(DataFrame)), or (None, {}) if no
+    inventory is loaded. The index is cached until the inventory is replaced.
+    """
+    with _inventory_lock:
+        if _inventory_data is None:
+            return None, {}
+        if builder not in _inventory_indexes:
+            _inventory_indexes[builder] = builder(_inventory_data)
+        return _inventory_data, _inventory_indexes[builder]
+
+def get_inventory_cas_index():
+    """(inventory DataFrame, build_cas_index() of it); see _get_inventory_index()."""
+    return _get_inventory_index(build_cas_index)
+
+def get_inventory_enrichment_index():
+    """(inventory DataFrame, build_enrichment_index() of it); see _get_inventory_index()."""
+    return _get_inventory_index(build_enrichment_index)
+
+def get_inventory_json():
+    """build_records_json() of the inventory, or None if no inventory is loaded; cached like the indexes."""
+    df, body = _get_inventory_index(build_records_json)
+    return body if df is not None else None
+
+def get_inventory_json_gzip():
+    """get_inventory_json() gzipped, or None if no inventory is loaded; cached like the indexes."""
+    df, body = _get_inventory_index(build_records_json_gzip)
+    return body if df is not None else None
+
+def add_search_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Add lowercase '_lc_<column>' copies of the searchable columns and the
+    combined SEARCH_BLOB column. Every '_lc_<column>' exists afterwards, all ''
+    when the sheet lacks the source column, so callers can always read them.
+    """
+    lc_columns = []
+    for col in SEARCH_COLUMNS:
+        if col in df.columns:
+            df[f'_lc_{col}'] = df[col].astype(str).str.lower().where(df[col].notna(), '')
+            lc_columns.append(f'_lc_{col}')
+        else:
+            df[f'_lc_{col}'] = ''
+    df[SEARCH_BLOB] = build_search_blob(df, lc_columns)
+    return df
+
+def build_search_blob(df: pd.DataFrame, columns) -> pd.Series:
+    """Join string columns row-wise with SEARCH_SEPARATOR ('' for an empty column list)."""
+    if not columns:
+        return pd.Series('', index=df.index)
+    return df[columns[0]].str.cat([df[col] for col in columns[1:]], sep=SEARCH_SEPARATOR)
+
+def search_blob_mask(df: pd.DataFrame, query: str):
+    """Boolean array of rows whose SEARCH_BLOB contains the (lowercase) query."""
+    if SEARCH_SEPARATOR in query:
+        # Would only match across field boundaries
+        return np.zeros(len(df), dtype=bool)
+    return df[SEARCH_BLOB].str.contains(query, regex=False).to_numpy()
+
+def build_cas_index(df: pd.DataFrame) -> dict:
+    """Map each stripped CAS number to the position of its first row (rows without one are skipped)."""
+    cas = df['cas_number'].str.strip()
+    first = (cas.notna() & ~cas.duplicated()).to_numpy()
+    return dict(zip(cas[first], np.flatnonzero(first)))
+
+def build_enrichment_index(df: pd.DataFrame) -> dict:
+    """
+    Map lowercase chemical names, CAS numbers and aliases to the position of the
+    last row holding them. Names are always indexed (missing ones as 'none');
+    CAS numbers and aliases only when not '' or 'nan'.
+    """
+    keys = []
+    positions = []
+    for col, keep_empty in (('chemical_name', True), ('cas_number', False), ('alias', False)):
+        if col in df.columns:
+            values = df[col].astype(str).str.lower().to_numpy()
+        else:
+            values = np.full(len(df), '', dtype=object)
+        keep = np.ones(len(df), dtype=bool) if keep_empty else (values != '') & (values != 'nan')
+        keys.append(values[keep])
+        positions.append(np.flatnonzero(keep))
+    # Stable sort by row so the last row wins when a key repeats
+    keys = np.concatenate(keys)
+    positions = np.concatenate(positions)
+    order = np.argsort(positions, kind='stable')
+    return dict(zip(keys[order], positions[order]))
+
+def drop_search_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """Return df without the helper columns added by add_search_columns()."""
+    return df.drop(columns=[col for col in df.columns if col.startswith('_lc_') or col == SEARCH_BLOB])
+
+def build_records_json(df: pd.DataFrame) -> bytes:
+    """JSON bytes of the inventory records as served by GET /api/inventory, without the helper columns."""
+    return dump_records(frame_to_records(drop_search_columns(df)))
+
+def build_records_json_gzip(df: pd.DataFrame) -> bytes:
+    """Gzipped build_records_json() of the loaded inventory, reusing its cached JSON."""
+    return gzip.compress(get_inventory_json(), compresslevel=INVENTORY_GZIP_LEVEL)
+
+def normalize_inventory_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Convert every cell to str, with None for missing values (NaN/NaT)."""
+    return df.astype(str).mask(df.isna(), None)
+
+def prepare_inventory_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Normalize an inventory sheet and add its search columns (run once per file version)."""
+    return add_search_columns(normalize_inventory_frame(df))
 
 def load_inventory() -> bool:
     """Load inventory from Excel file."""
@@ -33,13 +167,8 @@ def load_inventory() -> bool:
         inventory_path = config.INVENTORY_PATH
         
         # Read Excel file without parsing dates to avoid NaTType issues
-        df = pd.read_excel(inventory_path, parse_dates=False)
-        
-        # Convert all columns to string to avoid any datetime/NaT issues
-        for col in df.columns:
-            df[col] = df[col].astype(str)
-            # Replace 'nan' strings with None for better JSON handling
-            df[col] = df[col].replace('nan', None)
+        from .excel_cache import read_excel_cached
+        df = read_excel_cached(inventory_path, prepare=prepare_inventory_frame, parse_dates=False)
         
         set_inventory_data(df)
         return True
@@ -47,6 +176,37 @@ def load_inventory() -> bool:
         print(f"Error loading inventory: {e}")
         return False
 
+def load_inventory_in_background(app) -> threading.Thread:
+    """
+    Load inventory on a daemon thread so startup does not wait on Excel parsing.
+    
+    The inventory is process-wide, so while a load is already running (e.g.
+    started by another app) that thread is returned instead of a second parse.
+    """
+    global _inventory_loader
+    
+    def run():
+        try:
+            with app.app_context():
+                if load_inventory():
+                    app.logger.info("Inventory loaded successfully")
+                else:
+                    app.logger.warning("Failed to load inventory")
+        finally:
+            _inventory_ready.set()
+    
+    with _inventory_lock:
+        if _inventory_loader is not None and _inventory_loader.is_alive():
+            return _inventory_loader
+        _inventory_ready.clear()
+        _inventory_loader = threading.Thread(target=run, name='inventory-loader', daemon=True)
+        _inventory_loader.start()
+        return _inventory_loader
+
+def wait_for_inventory(timeout: float = 30) -> bool:
+    """Block until any background inventory load has finished."""
+    return _inventory_ready.wait(timeout)
+
 def is_inventory_loaded() -> bool:
     """Check if inventory is loaded."""
     with _inventory_lock:
@@ -0,0 +1,161 @@
+"""
+Tests for the application factory: initialization phases, memoization,
+CORS handling, response compression and precomputed error responses.
+"""
+import os
+import sys
+import gzip
+import json
+import unittest
+from datetime import datetime
+from unittest import mock
+
+# Add backend directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import FastRotatingFileHandler, create_app, reset_app_state, Phase
+from config import TestingConfig
+
+class TestAppFactory(unittest.TestCase):
+    """Test suite for create_app() and its middleware."""
+    
+    def setUp(self):
+        """Set up a fully initialized test app."""
+        self.app = create_app(TestingConfig)
+        self.client = self.app.test_client()
+    
+    def tearDown(self):
+        """Reset shared state between tests."""
+        reset_app_state()
+    
+    def test_create_app_is_memoized(self):
+        """Test that repeated calls return the same configured app."""
+        self.assertIs(create_app(TestingConfig), self.app)
+        self.assertIsNot(create_app(TestingConfig, phases=Phase.ROUTES), self.app)
+    
+    def test_routes_only_phase(self):
+        """Test that a routes-only app serves endpoints without CORS or security headers."""
+        app = create_app(TestingConfig, phases=Phase.ROUTES)
+        response = app.test_client().get('/api/experiment/context')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Access-Control-Allow-Origin', response.headers)
+        self.assertNotIn('X-Frame-Options', response.headers)
+    
+    def test_blueprints_load_on_first_request(self):
+        """Test that route modules are registered lazily."""
+        app = create_app(TestingConfig, phases=Phase.ROUTES | Phase.SECURITY)
+        self.assertFalse(app.extensions['blueprints_loaded'])
+        app.test_client().get('/api/experiment/context')
+        self.assertTrue(app.extensions['blueprints_loaded'])
+    
+    def test_security_headers(self):
+        """Test that security headers are added by the middleware."""
+        response = self.client.get('/api/experiment/context')
+        self.assertEqual(response.headers['X-Content-Type-Options'], 'nosniff')
+        self.assertEqual(response.headers['X-Frame-Options'], 'DENY')
+    
+    def test_cors_allowed_origin(self):
+        """Test that an allowed origin is echoed back."""
+        response = self.client.get('/api/experiment/context',
+                                   headers={'Origin': 'http://localhost:3000'})
+        self.assertEqual(response.headers['Access-Control-Allow-Origin'], 'http://localhost:3000')
+    
+    def test_cors_disallowed_origin(self):
+        """Test that other origins get no CORS headers."""
+        response = self.client.get('/api/experiment/context',
+                                   headers={'Origin': 'http://example.com'})
+        self.assertNotIn('Access-Control-Allow-Origin', response.headers)
+    
+    def test_cors_preflight(self):
+        """Test that preflight requests are answered with 204."""
+        response = self.client.options('/api/experiment/context', headers={
+            'Origin': 'http://localhost:3000',
+            'Access-Control-Request-Method': 'POST'
+        })
+        self.assertEqual(response.status_code, 204)
+        self.assertIn('POST', response.headers['Access-Control-Allow-Methods'])
+    
+    def test_not_found_response(self):
+        """Test the precomputed 404 body."""
+        response = self.client.get('/api/does-not-exist')
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(json.loads(response.data)['status_code'], 404)
+    
+    def test_other_http_errors_are_json(self):
+        """Test that errors without their own handler (e.g. 405) are JSON, not HTML."""
+        response = self.client.delete('/api/inventory')
+        self.assertEqual(response.status_code, 405)
+        self.assertEqual(response.mimetype, 'application/json')
+        self.assertEqual(json.loads(response.data)['status_code'], 405)
+        self.assertIn('GET', response.headers['Allow'])
+    
+    def test_datetimes_serialize_as_http_dates(self):
+        """Test that datetimes and Timestamps share Flask's HTTP date format."""
+        import pandas as pd
+        from json_provider import dump_records
+        
+        with self.app.app_context():
+            body = json.loads(self.app.json.dumps([datetime(2024, 1, 2, 3, 4, 5), pd.Timestamp('2024-01-02 03:04:05')]))
+            records = json.loads(dump_records([{'date': datetime(2024, 1, 2, 3, 4, 5)}]))
+        self.assertEqual(body, ['Tue, 02 Jan 2024 03:04:05 GMT'] * 2)
+        self.assertEqual(records, [{'date': 'Tue, 02 Jan 2024 03:04:05 GMT'}])
+    
+    def test_gzip_large_json(self):
+        """Test that large JSON responses are gzipped for clients that accept it."""
+        self.client.post('/api/experiment/procedure',
+                         json=[{'well': f'A{i}', 'materials': []} for i in range(1, 97)])
+        response = self.client.get('/api/experiment/procedure',
+                                   headers={'Accept-Encoding': 'gzip, deflate'})
+        self.assertEqual(response.headers.get('Content-Encoding'), 'gzip')
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+        self.assertEqual(len(json.loads(gzip.decompress(response.data))), 96)
+    
+    def test_inventory_gzip_is_cached(self):
+        """Test that the full inventory is gzipped once per load, not per request."""
+        import pandas as pd
+        from state.inventory import prepare_inventory_frame, set_inventory_data
+        
+        set_inventory_data(prepare_inventory_frame(pd.DataFrame({
+            'chemical_name': [f'Chemical {i}' for i in range(200)],
+            'cas_number': [f'{i}-00-0' for i in range(200)]
+        })))
+        try:
+            headers = {'Accept-Encoding': 'gzip'}
+            with mock.patch('gzip.compress', wraps=gzip.compress) as compress:
+                self.client.get('/api/inventory', headers=headers)
+                response = self.client.get('/api/inventory', headers=headers)
+            self.assertEqual(compress.call_count, 1)
+            self.assertEqual(response.headers.get('Content-Encoding'), 'gzip')
+            self.assertIn('Accept-Encoding', response.headers['Vary'])
+            self.assertEqual(json.loads(gzip.decompress(response.data)),
+                             json.loads(self.client.get('/api/inventory').data))
+        finally:
+            set_inventory_data(None)
+    
+    def test_no_gzip_without_accept_encoding(self):
+        """Test that clients not accepting gzip, and small bodies, get plain JSON."""
+        self.client.post('/api/experiment/procedure',
+                         json=[{'well': f'A{i}', 'materials': []} for i in range(1, 97)])
+        response = self.client.get('/api/experiment/procedure')
+        self.assertNotIn('Content-Encoding', response.headers)
+        response = self.client.get('/api/experiment/context', headers={'Accept-Encoding': 'gzip'})
+        self.assertNotIn('Content-Encoding', response.headers)
+    
+    def test_log_size_counts_encoded_bytes(self):
+        """Test that the rotating log handler tracks bytes written, not characters."""
+        import logging
+        import tempfile
+        
+        with tempfile.TemporaryDirectory() as log_dir:
+            handler = FastRotatingFileHandler(os.path.join(log_dir, 'test.log'), maxBytes=1024, encoding='utf-8')
+            handler.emit(logging.makeLogRecord({'msg': '5 μmol'}))
+            handler.close()
+            self.assertEqual(handler._bytes, os.path.getsize(handler.baseFilename))
+    
+    def test_trailing_slash(self):
+        """Test that trailing slashes match without a redirect."""
+        response = self.client.get('/api/experiment/context/')
+        self.assertEqual(response.status_code, 200)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
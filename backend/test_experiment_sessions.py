@@ -0,0 +1,153 @@
+"""
+Tests for per-session experiment state and partial procedure updates.
+"""
+import os
+import sys
+import json
+import unittest
+from unittest import mock
+
+# Add backend directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app, reset_app_state
+from config import TestingConfig
+from state.experiment import SESSION_HEADER, SESSION_IDLE_TIMEOUT, _session_experiments
+
+class TestExperimentSessions(unittest.TestCase):
+    """Test suite for session-scoped experiments and PATCH /api/experiment/procedure."""
+    
+    def setUp(self):
+        """Set up a fully initialized test app."""
+        self.app = create_app(TestingConfig)
+        self.client = self.app.test_client()
+    
+    def tearDown(self):
+        """Reset shared state between tests."""
+        reset_app_state()
+    
+    def get_procedure(self, headers=None):
+        """Fetch the procedure of the default or a named session."""
+        response = self.client.get('/api/experiment/procedure', headers=headers)
+        return json.loads(response.data)
+    
+    def test_sessions_are_isolated(self):
+        """Test that each session header gets its own experiment, apart from the default one."""
+        self.client.post('/api/experiment/procedure', json=[{'well': 'A1', 'materials': []}])
+        self.client.post('/api/experiment/procedure', json=[{'well': 'B2', 'materials': []}],
+                         headers={SESSION_HEADER: 'tab-one'})
+        
+        self.assertEqual([w['well'] for w in self.get_procedure()], ['A1'])
+        self.assertEqual([w['well'] for w in self.get_procedure({SESSION_HEADER: 'tab-one'})], ['B2'])
+        self.assertEqual(self.get_procedure({SESSION_HEADER: 'tab-two'}), [])
+    
+    def test_reset_only_affects_own_session(self):
+        """Test that a session's reset leaves the default experiment alone."""
+        self.client.post('/api/experiment/procedure', json=[{'well': 'A1', 'materials': []}])
+        self.client.post('/api/experiment/procedure', json=[{'well': 'B2', 'materials': []}],
+                         headers={SESSION_HEADER: 'tab-one'})
+        self.client.post('/api/experiment/reset', headers={SESSION_HEADER: 'tab-one'})
+        
+        self.assertEqual(self.get_procedure({SESSION_HEADER: 'tab-one'}), [])
+        self.assertEqual(len(self.get_procedure()), 1)
+    
+    def use_at(self, now, session_id, **kwargs):
+        """Write a session's procedure with the session clock at now."""
+        with mock.patch('state.experiment.time.monotonic', return_value=now):
+            return self.client.post('/api/experiment/procedure', json=[],
+                                    headers={SESSION_HEADER: session_id}, **kwargs)
+    
+    def test_idle_sessions_expire(self):
+        """Test that only sessions unused for SESSION_IDLE_TIMEOUT are dropped."""
+        self.use_at(0, 'tab-idle')
+        self.use_at(SESSION_IDLE_TIMEOUT - 1, 'tab-active')
+        self.use_at(SESSION_IDLE_TIMEOUT, 'tab-new')
+        
+        self.assertNotIn('tab-idle', _session_experiments)
+        self.assertIn('tab-active', _session_experiments)
+        self.assertIn('tab-new', _session_experiments)
+    
+    def test_reads_do_not_create_sessions(self):
+        """Test that GETs of an unknown session read an empty experiment without storing it."""
+        self.assertEqual(self.get_procedure({SESSION_HEADER: 'tab-one'}), [])
+        self.assertNotIn('tab-one', _session_experiments)
+    
+    def test_malformed_session_ids_are_rejected(self):
+        """Test that only ids shaped like the frontend's are accepted."""
+        for session_id in ('one', 'a' * 100, '../x-y', '8c1e0d2a-1b2c-4d3e-9f00-1234567890ab-extra'):
+            response = self.client.get('/api/experiment/procedure', headers={SESSION_HEADER: session_id})
+            self.assertEqual(response.status_code, 400, session_id)
+        
+        response = self.client.post('/api/experiment/procedure', json=[],
+                                    headers={SESSION_HEADER: '8c1e0d2a-1b2c-4d3e-9f00-1234567890ab'})
+        self.assertEqual(response.status_code, 200)
+    
+    @mock.patch('state.experiment.MAX_SESSIONS_PER_CLIENT', 2)
+    def test_sessions_per_client_are_capped(self):
+        """Test that one client's sessions cannot use up the store for others."""
+        self.use_at(0, 'tab-one')
+        self.use_at(1, 'tab-two')
+        
+        response = self.use_at(2, 'tab-three')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(json.loads(response.data)['status_code'], 429)
+        
+        other_client = {'environ_base': {'REMOTE_ADDR': '10.0.0.2'}}
+        self.assertEqual(self.use_at(3, 'tab-three', **other_client).status_code, 200)
+        
+        # Expired sessions no longer count against their client
+        self.assertEqual(self.use_at(SESSION_IDLE_TIMEOUT + 2, 'tab-four').status_code, 200)
+    
+    @mock.patch('state.experiment.MAX_SESSIONS', 2)
+    def test_full_store_refuses_new_sessions(self):
+        """Test that a new session gets a 503 instead of evicting a session in use."""
+        self.use_at(0, 'tab-one')
+        self.use_at(1, 'tab-two')
+        
+        response = self.use_at(2, 'tab-three')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(json.loads(response.data)['status_code'], 503)
+        self.assertEqual(list(_session_experiments), ['tab-one', 'tab-two'])
+        
+        # Known sessions keep working, and room frees up once one expires
+        self.assertEqual(self.use_at(3, 'tab-one').status_code, 200)
+        self.assertEqual(self.use_at(SESSION_IDLE_TIMEOUT + 1, 'tab-three').status_code, 200)
+        self.assertEqual(list(_session_experiments), ['tab-one', 'tab-three'])
+    
+    @mock.patch('state.experiment.MAX_SESSIONS', 2)
+    def test_reset_of_new_session_respects_limit(self):
+        """Test that resetting an unknown session goes through the same limit."""
+        self.use_at(0, 'tab-one')
+        with mock.patch('state.experiment.time.monotonic', return_value=1):
+            self.client.post('/api/experiment/reset', headers={SESSION_HEADER: 'tab-two'})
+            response = self.client.post('/api/experiment/reset', headers={SESSION_HEADER: 'tab-three'})
+        
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(list(_session_experiments), ['tab-one', 'tab-two'])
+    
+    def test_patch_procedure_upserts_wells(self):
+        """Test that PATCH replaces the sent wells and appends new ones, keeping the rest."""
+        self.client.post('/api/experiment/procedure', json=[
+            {'well': 'A1', 'materials': [{'name': 'a'}]},
+            {'well': 'A2', 'materials': []}
+        ])
+        response = self.client.patch('/api/experiment/procedure', json=[
+            {'well': 'A2', 'materials': [{'name': 'b'}]},
+            {'well': 'H12', 'materials': [{'name': 'c'}]}
+        ])
+        self.assertEqual(response.status_code, 200)
+        
+        procedure = self.get_procedure()
+        self.assertEqual([w['well'] for w in procedure], ['A1', 'A2', 'H12'])
+        self.assertEqual(procedure[0]['materials'], [{'name': 'a'}])
+        self.assertEqual(procedure[1]['materials'], [{'name': 'b'}])
+    
+    def test_patch_procedure_rejects_entries_without_well(self):
+        """Test that PATCH bodies must be a list of entries naming their well."""
+        response = self.client.patch('/api/experiment/procedure', json=[{'materials': []}])
+        self.assertEqual(response.status_code, 400)
+        response = self.client.patch('/api/experiment/procedure', json={'well': 'A1'})
+        self.assertEqual(response.status_code, 400)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,107 @@
+"""
+Tests for inventory search across the main and private inventories.
+"""
+import os
+import sys
+import json
+import threading
+import unittest
+from unittest import mock
+
+import pandas as pd
+
+# Add backend directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app, reset_app_state, Phase
+from config import TestingConfig
+from state.inventory import (
+    SEARCH_COLUMNS, load_inventory_in_background, prepare_inventory_frame, set_inventory_data, wait_for_inventory
+)
+
+class TestInventorySearch(unittest.TestCase):
+    """Test suite for GET /api/inventory/search."""
+    
+    def setUp(self):
+        """Set up a test app with an in-memory main inventory."""
+        self.app = create_app(TestingConfig, phases=Phase.ROUTES)
+        self.client = self.app.test_client()
+        set_inventory_data(prepare_inventory_frame(pd.DataFrame({
+            'chemical_name': ['Benzene', 'Toluene'],
+            'alias': ['benzol', None],
+            'cas_number': ['71-43-2', '108-88-3'],
+            'smiles': ['c1ccccc1', 'Cc1ccccc1']
+        })))
+    
+    def tearDown(self):
+        """Reset shared state between tests."""
+        set_inventory_data(None)
+        reset_app_state()
+    
+    def search(self, query, private_df):
+        """Search with private_df standing in for the private inventory file."""
+        with mock.patch('routes.inventory.os.path.exists', return_value=True), \
+             mock.patch('routes.inventory.read_excel_cached',
+                        side_effect=lambda path, prepare, **kwargs: prepare(private_df.copy())):
+            return self.client.get('/api/inventory/search', query_string={'q': query})
+    
+    def test_unknown_fields_keep_row_count(self):
+        """Test that filtering to no known fields still pages over every row, as empty records."""
+        response = self.client.get('/api/inventory', query_string={'fields': 'bogus', 'page': 1, 'limit': 1})
+        payload = json.loads(response.data)
+        self.assertEqual(payload['data'], [{}])
+        self.assertEqual(payload['pagination']['total'], 2)
+    
+    def test_background_load_runs_once_at_a_time(self):
+        """Test that a second app reuses the background load in flight instead of parsing again."""
+        release = threading.Event()
+        loads = []
+        
+        def slow_load():
+            loads.append(1)
+            release.wait(5)
+            return True
+        
+        wait_for_inventory()  # Let the default app's own load finish first
+        with mock.patch('state.inventory.load_inventory', side_effect=slow_load):
+            first = load_inventory_in_background(self.app)
+            second = load_inventory_in_background(create_app(TestingConfig, phases=Phase.ROUTES | Phase.CORS))
+            self.assertIs(first, second)
+            self.assertFalse(wait_for_inventory(timeout=0))
+            release.set()
+            self.assertTrue(wait_for_inventory(timeout=5))
+            first.join(5)
+        self.assertEqual(len(loads), 1)
+    
+    def test_search_columns_exist_for_missing_source_columns(self):
+        """Test that every '_lc_<column>' is created, blank when the sheet lacks the column."""
+        df = prepare_inventory_frame(pd.DataFrame({'alias': ['Benz-Private']}))
+        for col in SEARCH_COLUMNS:
+            self.assertIn(f'_lc_{col}', df.columns)
+        self.assertEqual(df['_lc_alias'].tolist(), ['benz-private'])
+        self.assertEqual(df['_lc_chemical_name'].tolist(), [''])
+    
+    def test_private_inventory_without_name_or_cas_columns(self):
+        """Test that a private sheet lacking chemical_name/cas_number is merged, not a 500."""
+        response = self.search('benz', pd.DataFrame({
+            'alias': ['Benz-Private'],
+            'smiles': ['c1ccccc1C'],
+            'location': ['Shelf 2']
+        }))
+        self.assertEqual(response.status_code, 200)
+        
+        results = json.loads(response.data)
+        self.assertEqual([r['alias'] for r in results], ['benzol', 'Benz-Private'])
+        self.assertIsNone(results[1]['chemical_name'])
+    
+    def test_private_duplicates_of_main_results_are_dropped(self):
+        """Test that private rows matching a main result by name or CAS are left out."""
+        response = self.search('benz', pd.DataFrame({
+            'chemical_name': ['BENZENE', 'Benzaldehyde'],
+            'cas_number': [None, '100-52-7']
+        }))
+        results = json.loads(response.data)
+        self.assertEqual([r['chemical_name'] for r in results], ['Benzene', 'Benzaldehyde'])
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
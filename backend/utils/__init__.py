@@ -0,0 +1,21 @@
+"""
+Shared helpers for HTE App route handlers.
+"""
+from .dataframes import frame_to_records, drop_blank_first_cell_rows
+from .plates import PLATE_CONFIGS, ALL_WELL_NAMES, ALL_WELL_NAME_SET, get_plate_config, get_plate_well_names, get_plate_wells
+from .materials import extract_materials, material_keys, add_material_keys, is_duplicate_material
+
+__all__ = [
+    'frame_to_records',
+    'drop_blank_first_cell_rows',
+    'extract_materials',
+    'material_keys',
+    'add_material_keys',
+    'is_duplicate_material',
+    'PLATE_CONFIGS',
+    'ALL_WELL_NAMES',
+    'ALL_WELL_NAME_SET',
+    'get_plate_config',
+    'get_plate_well_names',
+    'get_plate_wells'
+]
@@ -0,0 +1,27 @@
+"""
+DataFrame helpers.
+Fast conversions between pandas frames and the JSON-ready structures stored in state.
+"""
+
+def frame_to_records(df):
+    """
+    Convert a DataFrame to a list of row dicts, like df.to_dict('records').
+    
+    Each column is boxed once with Series.tolist() (native Python scalars,
+    Timestamps for datetimes) and rows are assembled with zip, avoiding the
+    per-cell boxing of to_dict('records') and iterrows().
+    """
+    columns = df.columns.tolist()
+    if not columns:
+        # zip() of no columns yields no rows; to_dict('records') gives one {} per row
+        return [{} for _ in range(len(df))]
+    values = [df.iloc[:, i].tolist() for i in range(len(columns))]
+    return [dict(zip(columns, row)) for row in zip(*values)]
+
+def drop_blank_first_cell_rows(df):
+    """Return the rows of df whose first cell is neither missing nor blank."""
+    if df.shape[1] == 0:
+        return df
+    first_cells = df.iloc[:, 0]
+    has_first_cell = first_cells.notna() & (first_cells.astype(object).astype(str).str.strip() != '')
+    return df[has_first_cell.to_numpy()]
@@ -0,0 +1,67 @@
+"""
+Materials sheet parsing.
+Shared by the materials upload and kit analysis endpoints.
+"""
+from .dataframes import drop_blank_first_cell_rows
+
+# Sheet columns for each material field, in lookup order (old and new header names)
+MATERIAL_FIELD_COLUMNS = {
+    'name': ('chemical_name', 'Chemical_Name', 'Name'),
+    'alias': ('alias', 'Alias'),
+    'cas': ('cas_number', 'CAS_Number', 'CAS'),
+    'smiles': ('smiles', 'SMILES'),
+    'molecular_weight': ('molecular_weight', 'Molecular_Weight', 'Molecular Weight'),
+    'barcode': ('barcode', 'Barcode', 'Lot number'),
+    'role': ('role', 'Role'),
+}
+
+# Cell values treated as empty (compared lowercase, after stripping)
+EMPTY_MARKERS = ('nan', 'null', 'none', '')
+
+def clean_text_column(series):
+    """Stripped string values, with '' for missing cells and common "empty" representations."""
+    text = series.astype(object).astype(str).str.strip()
+    return text.mask(series.isna() | text.str.lower().isin(EMPTY_MARKERS), '')
+
+def extract_materials(materials_df, source):
+    """
+    Read material dicts from a Materials sheet, one column at a time.
+    
+    Each field comes from the first of its MATERIAL_FIELD_COLUMNS present in
+    the sheet; the name falls back to the second column. Rows whose first
+    cell is empty are skipped. Callers decide which materials to keep.
+    """
+    if materials_df.shape[1] == 0:
+        return []
+    
+    df = drop_blank_first_cell_rows(materials_df)
+    
+    values = []
+    for field, columns in MATERIAL_FIELD_COLUMNS.items():
+        column = next((col for col in columns if col in df.columns), None)
+        if column is not None:
+            values.append(clean_text_column(df[column]).tolist())
+        elif field == 'name' and df.shape[1] > 1:
+            values.append(clean_text_column(df.iloc[:, 1]).tolist())
+        else:
+            values.append([''] * len(df))
+    
+    fields = list(MATERIAL_FIELD_COLUMNS)
+    return [dict(zip(fields, row), source=source) for row in zip(*values)]
+
+# Material fields that identify the same chemical
+IDENTITY_FIELDS = ('name', 'cas', 'smiles')
+
+def material_keys(materials):
+    """Sets of the non-empty name, CAS and SMILES values of a list of materials."""
+    return {field: {m.get(field) for m in materials if m.get(field)} for field in IDENTITY_FIELDS}
+
+def add_material_keys(keys, material):
+    """Add a material's identity values to sets built by material_keys()."""
+    for field in IDENTITY_FIELDS:
+        if material.get(field):
+            keys[field].add(material.get(field))
+
+def is_duplicate_material(material, keys):
+    """Whether the material shares a non-empty name, CAS or SMILES with the indexed materials."""
+    return any(material.get(field) and material.get(field) in keys[field] for field in IDENTITY_FIELDS)
@@ -0,0 +1,44 @@
+"""
+Well plate layouts.
+Row and column bounds of the supported plate types.
+"""
+
+# Plate type -> row/column counts and the last row letter/column number
+PLATE_CONFIGS = {
+    '24': {'rows': 4, 'cols': 6, 'max_row': 'D', 'max_col': 6},
+    '48': {'rows': 6, 'cols': 8, 'max_row': 'F', 'max_col': 8},
+    '96': {'rows': 8, 'cols': 12, 'max_row': 'H', 'max_col': 12},
+}
+
+# Plate row letters by zero-based row index (up to the 8 rows of a 96-well plate)
+ROW_LETTERS = 'ABCDEFGH'
+
+# Well names by zero-based (row, column) index, up to a 96-well plate
+WELL_NAMES = tuple(tuple(f"{row}{col}" for col in range(1, 13)) for row in ROW_LETTERS)
+
+# All 96 well names in row-major order (A1, A2, ..., H12), and as a set
+ALL_WELL_NAMES = tuple(name for row in WELL_NAMES for name in row)
+ALL_WELL_NAME_SET = frozenset(ALL_WELL_NAMES)
+
+# Plate type -> well names of the plate in row-major order, and as a set
+PLATE_WELL_NAMES = {
+    plate_type: tuple(
+        WELL_NAMES[row][col]
+        for row in range(config['rows'])
+        for col in range(config['cols'])
+    )
+    for plate_type, config in PLATE_CONFIGS.items()
+}
+PLATE_WELL_NAME_SETS = {plate_type: frozenset(names) for plate_type, names in PLATE_WELL_NAMES.items()}
+
+def get_plate_config(plate_type):
+    """Layout of a plate type, falling back to the 96-well plate for unknown types."""
+    return PLATE_CONFIGS.get(plate_type, PLATE_CONFIGS['96'])
+
+def get_plate_well_names(plate_type):
+    """Well names that fit on a plate type, falling back to the 96-well plate for unknown types."""
+    return PLATE_WELL_NAME_SETS.get(plate_type, PLATE_WELL_NAME_SETS['96'])
+
+def get_plate_wells(plate_type):
+    """Well names of a plate type in row-major order (A1, A2, ...), falling back to the 96-well plate."""
+    return PLATE_WELL_NAMES.get(plate_type, PLATE_WELL_NAMES['96'])
@@ -398,6 +398,7 @@ const Procedure = () => {
 
     // Create the updated procedure data directly
     const updatedProcedure = [...procedure];
+    const changedWells = [];
 
     selectedWells.forEach((wellId) => {
       const existingIndex = updatedProcedure.findIndex(
@@ -416,16 +417,18 @@ const Procedure = () => {
           ...wellData,
           materials: updatedMaterials,
         };
+        changedWells.push(updatedProcedure[existingIndex]);
       } else {
         updatedProcedure.push({ well: wellId, materials: updatedMaterials });
+        changedWells.push(updatedProcedure[updatedProcedure.length - 1]);
       }
     });
 
-    // Update state and save to backend
+    // Update state and save the changed wells to backend
     setProcedure(updatedProcedure);
 
     try {
-      await axios.post("/api/experiment/procedure", updatedProcedure);
+      await axios.patch("/api/experiment/procedure", changedWells);
     } catch (error) {
       console.error("Error auto-saving procedure:", error);
       showError("Error saving changes: " + error.message);
@@ -452,7 +455,7 @@ const Procedure = () => {
 
     // Create the updated procedure data directly
     const updatedProcedure = [...procedure];
-    let removedCount = 0;
+    const changedWells = [];
 
     selectedWells.forEach((wellId) => {
       const existingIndex = updatedProcedure.findIndex(
@@ -472,17 +475,17 @@ const Procedure = () => {
             ...wellData,
             materials: updatedMaterials,
           };
-          removedCount++;
+          changedWells.push(updatedProcedure[existingIndex]);
         }
       }
     });
 
-    if (removedCount > 0) {
-      // Update state and save to backend
+    if (changedWells.length > 0) {
+      // Update state and save the changed wells to backend
       setProcedure(updatedProcedure);
 
       try {
-        await axios.post("/api/experiment/procedure", updatedProcedure);
+        await axios.patch("/api/experiment/procedure", changedWells);
       } catch (error) {
         console.error("Error auto-saving procedure:", error);
         showError("Error saving changes: " + error.message);
@@ -2,6 +2,23 @@ import React from "react";
 import ReactDOM from "react-dom/client";
 import "./index.css";
 import App from "./App";
+import axios from "axios";
+
+// One backend experiment per browser tab: the id lives in sessionStorage, so it
+// survives reloads but is not shared with other tabs or users
+const SESSION_ID_KEY = "experimentSessionId";
+const getSessionId = () => {
+  let sessionId = sessionStorage.getItem(SESSION_ID_KEY);
+  if (!sessionId) {
+    // randomUUID is only available in secure contexts (https or localhost)
+    sessionId = window.crypto?.randomUUID
+      ? window.crypto.randomUUID()
+      : `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+    sessionStorage.setItem(SESSION_ID_KEY, sessionId);
+  }
+  return sessionId;
+};
+axios.defaults.headers.common["X-Session-Id"] = getSessionId();
 
 const root = ReactDOM.createRoot(document.getElementById("root"));
 root.render(